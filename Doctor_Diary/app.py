@@ -1,8 +1,88 @@
+import services.bulk_export as bulk_export
+import services.bulk_import as bulk_import
 from services.choice_controller import ChoiceController
-from services.model_manager import ModelManager
+from services.data_service import create_archive, create_storage
+from services.model_manager import ModelManager, days_period
 from services.user_interface import UserInterface
 
 
+def run_import(kind, filename, file_format=None, storage="json", persistence="full", durability="operation"):
+    """
+    Import patients or appointments from CSV or JSON Lines file without the interactive menu.
+    Rejected records are printed with their line numbers, accepted ones are saved with a single flush.
+
+    Arguments:
+        kind (str): 'patients' or 'appointments'
+        filename (str): relative path for the imported file
+        file_format (str | None): 'csv' or 'jsonl', None to guess it from the file extension
+        storage (str): 'json', 'columnar', 'sharded' or 'sqlite' storage of the app data
+        persistence (str): 'full' or 'journal' mode of saving json files
+        durability (str): 'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+    """
+
+    model_manager = ModelManager(create_storage(storage, persistence), durability)
+    user_interface = UserInterface()
+    try:
+        imported, rejected = bulk_import.import_file(model_manager, kind, filename, file_format,
+                                                     user_interface.print_import_error)
+        model_manager.save_changes()
+    finally:
+        model_manager.close()
+    user_interface.print_info(f"IMPORTED {kind}: {imported}, REJECTED: {rejected}")
+
+
+def run_export(kind, filename, file_format=None, first_date=None, last_date=None,
+               storage="json", persistence="full", durability="operation"):
+    """
+    Export patients or appointments to CSV, JSON Lines or iCalendar file without the interactive menu.
+    Appointments are streamed from the date index sorted by date and time.
+
+    Arguments:
+        kind (str): 'patients' or 'appointments'
+        filename (str): relative path for the exported file
+        file_format (str | None): 'csv', 'jsonl' or 'ics', None to guess it from the file extension
+        first_date (date | None): first day of exported appointments, None for no limit
+        last_date (date | None): last day of exported appointments (inclusive), None for no limit
+        storage (str): 'json', 'columnar', 'sharded' or 'sqlite' storage of the app data
+        persistence (str): 'full' or 'journal' mode of saving json files
+        durability (str): 'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+    """
+
+    model_manager = ModelManager(create_storage(storage, persistence), durability)
+    try:
+        if kind == "patients":
+            objects = model_manager.get_all_registered_patients()
+        else:
+            objects = model_manager.get_appointments_between(*days_period(first_date, last_date))
+        count = bulk_export.export_file(kind, filename, file_format, objects, model_manager.get_patient_by_number)
+    finally:
+        model_manager.close()
+    UserInterface().print_info(f"EXPORTED {kind}: {count}")
+
+
+def run_archive(before, compression="gzip", storage="json", persistence="full", durability="operation"):
+    """
+    Move appointments booked before the cutoff date into compressed per-year archives (data/archive directory)
+    without the interactive menu. Archived appointments are still listed with appointments of their patients.
+
+    Arguments:
+        before (date): first day of appointments which stay in the app data
+        compression (str): 'gzip' or 'lzma' compression of the archives
+        storage (str): 'json', 'columnar', 'sharded' or 'sqlite' storage of the app data
+        persistence (str): 'full' or 'journal' mode of saving json files
+        durability (str): 'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+    """
+
+    model_manager = ModelManager(create_storage(storage, persistence), durability,
+                                 archive=create_archive(compression))
+    try:
+        count = model_manager.archive_appointments(before)
+        model_manager.save_changes()
+    finally:
+        model_manager.close()
+    UserInterface().print_info(f"ARCHIVED appointments: {count}")
+
+
 class App:
     """
     A class to manage the app running and dependencies.
@@ -21,14 +101,49 @@ class App:
     The app is hard-coded to read specified named and structured (JSON array) files.
     You shouldn't change the data/patients.json and data/appointments.json files.
     If the files are corrupted, create new 'patients.json' and 'appointments.json' files
-    in the data directory and fill them only with '[]'.
+    in the data directory and fill them only with '[]'. Running apps load json files replaced this way
+    before their next operation.
+
+    With the 'journal' persistence every change is appended to data/journal.jsonl
+    and compacted into the json files in the background and when the app exits.
+    The durability mode decides if changes are flushed to disk after every operation,
+    in groups ('coalesced') or only when the app exits.
+
+    Json storages save a binary snapshot (data/diary.snapshot) of loaded data when the app exits.
+    It is loaded instead of the json files on the next start, unless the json files were changed since then.
+    With the 'columnar' storage appointments are kept in memory as typed arrays instead of objects.
+    With the 'sharded' storage appointments are kept in month files (data/appointments/YYYY-MM.json)
+    and only the months in use are loaded.
+    With the 'sqlite' storage data are kept in data/diary.sqlite3 database instead of json files.
+    The new database is filled with data from the json files.
+
+    Several apps (the console app and GUI apps on other terminals) can use the data directory at the same time,
+    if they use the same storage and persistence (both apps take the same command line options).
+    Changes are made with data/diary.lock locked and apps load only changes made by the others,
+    changes which are not saved yet are merged with them.
+
+    Past appointments can be moved into compressed per-year archives (data/archive directory)
+    with the 'archive' command of main.py (see run_archive), so the app data stay small.
+    Archived appointments are still listed with appointments of their patients.
+
+    Large numbers of patients and appointments can be imported from CSV or JSON Lines files
+    with the 'import' command of main.py (see run_import) and exported to CSV, JSON Lines
+    or iCalendar files with the 'export' command (see run_export).
 
     The app architecture tries to follow the MVC pattern.
     """
 
-    def __init__(self):
-        self.model_manager = ModelManager("data/patients.json",
-                                          "data/appointments.json")
+    def __init__(self, storage="json", persistence="full", durability="operation"):
+        """
+        Arguments:
+            storage (str): 'json' for json files, 'columnar' for json files with compact appointments,
+            'sharded' for json files with appointments sharded by month, 'sqlite' for SQLite database
+            persistence (str): 'full' to rewrite json files on every change,
+            'journal' to append changes to the journal file
+            durability (str): 'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+        """
+
+        self.model_manager = ModelManager(create_storage(storage, persistence), durability, archive=create_archive())
         self.user_interface = UserInterface()
         self.choice_controller = ChoiceController(self.model_manager, self.user_interface)
         self.start_app()
@@ -39,3 +154,4 @@ class App:
         run_app = True
         while run_app:
             run_app = self.choice_controller.start()
+        self.model_manager.close()
@@ -1,13 +1,19 @@
 import sys
-import json
-import os
-from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QPushButton, QLabel, QLineEdit, QDialog, QDateEdit, QTimeEdit, QTextEdit, QListWidget, QMessageBox, QWidget
-from PyQt5.QtCore import Qt, QDate, QTime
+import argparse
+import datetime
+import itertools
+import threading
+from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QPushButton, QLabel, QLineEdit, QDialog, QDateEdit, QTimeEdit, QTextEdit, QListWidget, QListView, QMessageBox, QWidget, QSpinBox, QComboBox, QCheckBox, QFileDialog, QProgressBar
+from PyQt5.QtCore import Qt, QDate, QTime, QAbstractListModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
 from enum import Enum
 
+import helper_classes.json_service as json_service
+import services.bulk_export as bulk_export
+import services.model_entities as model_entities
+from services.data_service import DataService, add_storage_arguments
+from services.model_manager import days_period
+
 DATA_DIR = "data"
-PATIENTS_FILE = os.path.join(DATA_DIR, "patients.json")
-APPOINTMENTS_FILE = os.path.join(DATA_DIR, "appointments.json")
 
 class Choice(Enum):
     EXIT = 0
@@ -19,24 +25,356 @@ class Choice(Enum):
     DELETE_PATIENT = 6
     CANCEL_APPOINTMENT = 7
     PRINT_ALL_APPOINTMENTS = 8
+    PRINT_PERIOD_APPOINTMENTS = 9
+    FIND_FREE_SLOTS = 10
+    EXPORT_DATA = 11
+    SEARCH_PATIENTS = 12
+
+
+def qt_date(date_input):
+    return date_input.date().toPyDate()
+
+
+def qt_time(time_input):
+    # Milliseconds of the edited time are dropped, appointments are booked with second precision.
+    return json_service.parse_time(time_input.time().toString("HH:mm:ss"))
+
+
+def format_patient(patient):
+    return f"{patient.firstname} {patient.lastname}, NUMBER: {patient.number}"
+
+
+def format_appointment(appt):
+    return (f"NUMBER: {appt.patient_number}, Date: {appt.date}, Time: {appt.time}, "
+            f"Duration: {appt.duration} min, Description: {appt.description}")
+
+
+def format_day_appointment(appt):
+    return f"NUMBER: {appt.patient_number}, Time: {appt.time}, Duration: {appt.duration} min, Description: {appt.description}"
+
+
+def format_patient_appointment(appt):
+    return f"Date: {appt.date}, Time: {appt.time}, Duration: {appt.duration} min, Description: {appt.description}"
+
+
+def format_slot(slot):
+    return f"Date: {slot.date()}, Time: {slot.strftime('%H:%M')}"
+
+
+def iterator_pages(get_records):
+    # Pages of a list or a lazily produced sequence (e.g. ModelManager.get_appointments_between) for RecordListModel,
+    # get_records(model) is called by the data worker when the first page is fetched.
+    iterator = None
+
+    def fetch_page(model, cursor, page_size):
+        nonlocal iterator
+        if iterator is None:
+            iterator = iter(get_records(model))
+        page = list(itertools.islice(iterator, page_size))
+        return page, None if len(page) < page_size else (cursor or 0) + len(page)
+
+    return fetch_page
+
+
+def show_status(parent, status, success_status, title, text):
+    if status == success_status:
+        QMessageBox.information(parent, title, text)
+        return True
+    QMessageBox.warning(parent, "Error", status)
+    return False
+
+
+class DataTask(QRunnable):
+    def __init__(self, data_worker, function, on_result, on_error, change):
+        super().__init__()
+        self.data_worker = data_worker
+        self.function = function
+        self.on_result = on_result
+        self.on_error = on_error
+        self.change = change
+
+    def run(self):
+        self.data_worker.run_task(self)
+
+
+class DataWorker(QObject):
+    # Loading, queries, changes and saving run one by one on a background thread, so the window never waits
+    # for the disk and the model is never used by two threads at once. Results come back through signals.
+    task_done = pyqtSignal(object, object)
+    task_failed = pyqtSignal(object, str)
+    busy_changed = pyqtSignal(bool)
+    # Saved changes conflicting with changes made meanwhile by another app (e.g. on another terminal)
+    changes_dropped = pyqtSignal(str)
+
+    def __init__(self, data_service, parent=None):
+        super().__init__(parent)
+        self.data_service = data_service
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(1)
+        # Tasks not finished yet (counted by the window thread)
+        self.running = 0
+        # Changes not finished yet (counted by both threads), changes queued behind a running one are saved together
+        self.pending_changes = 0
+        self.lock = threading.Lock()
+        self.task_done.connect(self.finish_task)
+        self.task_failed.connect(self.fail_task)
+        self.changes_dropped.connect(self.show_dropped_changes)
+
+    def run(self, function, on_result=None, on_error=None, change=False):
+        # function(model) runs on the worker thread, on_result(result) and on_error(text) on the window thread
+        if change:
+            with self.lock:
+                self.pending_changes += 1
+        self.running += 1
+        if self.running == 1:
+            self.busy_changed.emit(True)
+        self.pool.start(DataTask(self, function, on_result, on_error, change))
+
+    def change(self, function, on_result=None, on_error=None):
+        self.run(function, on_result, on_error, change=True)
+
+    def run_task(self, task):
+        try:
+            try:
+                result = task.function(self.data_service.model())
+            finally:
+                if task.change:
+                    self.change_done()
+        except Exception as error:
+            self.task_failed.emit(task.on_error, str(error))
+        else:
+            self.task_done.emit(task.on_result, result)
+
+    def change_done(self):
+        with self.lock:
+            self.pending_changes -= 1
+            last_change = self.pending_changes == 0
+        if last_change:
+            conflicts = self.data_service.save_changes()
+            if conflicts:
+                self.changes_dropped.emit("\n".join(conflicts))
+
+    def task_finished(self):
+        self.running -= 1
+        if self.running == 0:
+            self.busy_changed.emit(False)
+
+    def finish_task(self, on_result, result):
+        self.task_finished()
+        if on_result is not None:
+            on_result(result)
+
+    def fail_task(self, on_error, text):
+        self.task_finished()
+        if on_error is not None:
+            on_error(text)
+        else:
+            QMessageBox.warning(self.parent(), "Error", text)
+
+    def show_dropped_changes(self, text):
+        QMessageBox.warning(self.parent(), "Changes dropped", text)
+
+    def wait_for_done(self):
+        self.pool.waitForDone()
+
+
+class RecordListModel(QAbstractListModel):
+    # Rows are fetched page by page by the data worker as the view scrolls and formatted only when they are painted,
+    # so opening a list of any length costs the same. fetch_page(model, cursor, page_size) returns
+    # (records, cursor of the next page or None) like ModelManager.get_patients_page.
+    FETCH_SIZE = 500
+    page_fetched = pyqtSignal()
+
+    def __init__(self, data_worker, fetch_page, formatter):
+        super().__init__()
+        self.data_worker = data_worker
+        self.fetch_page = fetch_page
+        self.formatter = formatter
+        self.records = []
+        self.cursor = None
+        self.exhausted = False
+        self.fetching = False
+        self.cancelled = False
+
+    def cancel(self):
+        # Pages of a replaced list (e.g. results for an older search text) are not fetched any more
+        self.cancelled = True
+        self.exhausted = True
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self.exhausted and not self.fetching
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self.exhausted or self.fetching:
+            return
+        self.fetching = True
+        cursor = self.cursor
+        self.data_worker.run(lambda model: ([], None) if self.cancelled else
+                             self.fetch_page(model, cursor, self.FETCH_SIZE), self.add_page)
+
+    def add_page(self, result):
+        if self.cancelled:
+            return
+        page, self.cursor = result
+        self.fetching = False
+        self.exhausted = self.cursor is None
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.records), len(self.records) + len(page) - 1)
+            self.records.extend(page)
+            self.endInsertRows()
+        self.page_fetched.emit()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self.formatter(self.records[index.row()])
+        return None
+
+
+class RecordsDialog(QDialog):
+    # Result list built once and filled with new records on every open.
+    def __init__(self, data_worker, formatter, empty_text, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.formatter = formatter
+        self.empty_text = empty_text
+
+        layout = QVBoxLayout()
+
+        self.list_view = QListView()
+        # Rows have the same height, the view does not have to measure every row.
+        self.list_view.setUniformItemSizes(True)
+        layout.addWidget(self.list_view)
+
+        self.empty_label = QLabel()
+        layout.addWidget(self.empty_label)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+        self.setLayout(layout)
+
+    def set_records(self, fetch_page):
+        list_model = RecordListModel(self.data_worker, fetch_page, self.formatter)
+        list_model.page_fetched.connect(self.update_list)
+        self.list_view.setModel(list_model)
+        self.list_view.hide()
+        self.empty_label.setText("Loading...")
+        self.empty_label.show()
+        list_model.fetchMore(QModelIndex())
+
+    def update_list(self):
+        list_model = self.list_view.model()
+        if list_model.records:
+            self.list_view.show()
+            self.empty_label.hide()
+        elif list_model.exhausted:
+            self.empty_label.setText(self.empty_text)
+
+    def show_records(self, title, fetch_page):
+        self.setWindowTitle(title)
+        self.set_records(fetch_page)
+        self.exec_()
+
+
+class PatientPicker(QWidget):
+    # Patient number input listing matching patients as the user types, by number prefix or by names.
+    # Queries start when typing pauses and run on the data worker, results of older texts are dropped.
+    DEBOUNCE_MS = 250
+    SEARCH_LIMIT = 200
+    patient_selected = pyqtSignal(object)
+
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        number_label = QLabel("Patient's NUMBER (or type a name to find it):")
+        layout.addWidget(number_label)
+        self.number_input = QLineEdit()
+        self.number_input.textEdited.connect(self.schedule_filter)
+        layout.addWidget(self.number_input)
+
+        self.matches_view = QListView()
+        self.matches_view.setUniformItemSizes(True)
+        self.matches_view.clicked.connect(self.select_patient)
+        self.matches_view.hide()
+        layout.addWidget(self.matches_view)
+
+        self.setLayout(layout)
+
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(self.DEBOUNCE_MS)
+        self.filter_timer.timeout.connect(self.filter_patients)
+
+    def schedule_filter(self):
+        self.filter_timer.start()
+
+    def filter_patients(self):
+        old_model = self.matches_view.model()
+        if old_model is not None:
+            old_model.cancel()
+
+        text = self.number_input.text().strip()
+        if not text:
+            self.matches_view.setModel(None)
+            self.matches_view.hide()
+            return
+
+        if text.isdigit():
+            def fetch_page(model, cursor, page_size):
+                return model.get_patients_page(cursor, page_size, number_prefix=text)
+        else:
+            fetch_page = iterator_pages(lambda model: model.search_patients(text, self.SEARCH_LIMIT))
+
+        list_model = RecordListModel(self.data_worker, fetch_page, format_patient)
+        self.matches_view.setModel(list_model)
+        self.matches_view.show()
+        list_model.fetchMore(QModelIndex())
+
+    def select_patient(self, index):
+        patient = self.matches_view.model().records[index.row()]
+        # setText does not emit textEdited, the list is not filtered again
+        self.number_input.setText(patient.number)
+        self.patient_selected.emit(patient)
+
 
 class UserInterface(QMainWindow):
-    def __init__(self):
+    def __init__(self, data_service=None):
         super().__init__()
-        
+
         self.setWindowTitle("Medical Appointment Scheduler")
         self.setGeometry(100, 100, 800, 600)
-        
-        # Ensure data directory exists
-        os.makedirs(DATA_DIR, exist_ok=True)
-        
-        # Ensure JSON files exist
-        self.ensure_json_file(PATIENTS_FILE)
-        self.ensure_json_file(APPOINTMENTS_FILE)
-        
+
+        # Data files are loaded (and created if missing) once, dialogs get the loaded data from the window
+        self.data_service = data_service or DataService(data_dir=DATA_DIR)
+        self.data_worker = DataWorker(self.data_service, self)
+        # Dialogs are built on the first open and reused, they keep entered values between opens
+        self.dialogs = {}
+
+        self.setCentralWidget(self.create_main_widget())
+
+        # Busy indicator shown while the data worker loads, saves or queries data
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setMaximumWidth(150)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+        self.data_worker.busy_changed.connect(self.progress_bar.setVisible)
+
+        # Data files are loaded in the background while the window is shown
+        self.data_worker.run(lambda model: None)
+
+    def create_main_widget(self):
         # Main layout
         layout = QVBoxLayout()
-        
+
         # Welcome message
         welcome_label = QLabel("""
         |=============================================|
@@ -45,7 +383,7 @@ class UserInterface(QMainWindow):
         |=============================================| """)
         welcome_label.setAlignment(Qt.AlignCenter)
         layout.addWidget(welcome_label)
-        
+
         # Buttons for each action
         self.add_patient_btn = QPushButton("1. ADD NEW PATIENT")
         self.add_patient_btn.clicked.connect(self.add_patient)
@@ -79,31 +417,80 @@ class UserInterface(QMainWindow):
         self.print_all_appointments_btn.clicked.connect(self.print_all_appointments)
         layout.addWidget(self.print_all_appointments_btn)
 
+        self.print_period_appointments_btn = QPushButton("9. DISPLAY APPOINTMENTS BETWEEN DATES")
+        self.print_period_appointments_btn.clicked.connect(self.show_period_appointments_window)
+        layout.addWidget(self.print_period_appointments_btn)
+
+        self.find_free_slots_btn = QPushButton("10. FIND FREE TIME SLOTS")
+        self.find_free_slots_btn.clicked.connect(self.show_free_slots_window)
+        layout.addWidget(self.find_free_slots_btn)
+
+        self.export_data_btn = QPushButton("11. EXPORT DATA")
+        self.export_data_btn.clicked.connect(self.show_export_window)
+        layout.addWidget(self.export_data_btn)
+
+        self.search_patients_btn = QPushButton("12. SEARCH PATIENTS BY NAME")
+        self.search_patients_btn.clicked.connect(self.show_search_patients_window)
+        layout.addWidget(self.search_patients_btn)
+
         self.exit_btn = QPushButton("0. EXIT")
         self.exit_btn.clicked.connect(self.close)
         layout.addWidget(self.exit_btn)
-        
+
         # Set main layout
         container = QWidget()
         container.setLayout(layout)
-        self.setCentralWidget(container)
+        return container
+
+    def show_dialog(self, dialog_class):
+        dialog = self.dialogs.get(dialog_class)
+        if dialog is None:
+            dialog = dialog_class(self.data_worker, self)
+            self.dialogs[dialog_class] = dialog
+        dialog.exec_()
 
-    def ensure_json_file(self, filepath):
-        if not os.path.exists(filepath):
-            with open(filepath, 'w') as file:
-                json.dump([], file)
+    def add_patient(self):
+        self.show_dialog(AddPatientDialog)
 
-    def read_json(self, filepath):
-        with open(filepath, 'r') as file:
-            return json.load(file)
+    def add_appointment(self):
+        self.show_dialog(AddAppointmentDialog)
 
-    def write_json(self, filepath, data):
-        with open(filepath, 'w') as file:
-            json.dump(data, file, indent=4)
+    def print_all_appointments(self):
+        self.show_dialog(AllAppointmentsDialog)
 
-    def add_patient(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Add New Patient")
+    def show_patient_window(self):
+        self.show_dialog(PatientDialog)
+
+    def show_daily_appointments_window(self):
+        self.show_dialog(DailyAppointmentsDialog)
+
+    def show_patient_appointments_window(self):
+        self.show_dialog(PatientAppointmentsDialog)
+
+    def show_period_appointments_window(self):
+        self.show_dialog(PeriodAppointmentsDialog)
+
+    def show_free_slots_window(self):
+        self.show_dialog(FreeSlotsDialog)
+
+    def show_export_window(self):
+        self.show_dialog(ExportDialog)
+
+    def show_search_patients_window(self):
+        self.show_dialog(SearchPatientsDialog)
+
+    def delete_patient(self):
+        self.show_dialog(DeletePatientDialog)
+
+    def cancel_appointment(self):
+        self.show_dialog(CancelAppointmentDialog)
+
+
+class AddPatientDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Add New Patient")
 
         layout = QVBoxLayout()
 
@@ -123,34 +510,33 @@ class UserInterface(QMainWindow):
         layout.addWidget(self.number_input)
 
         save_button = QPushButton("Save")
-        save_button.clicked.connect(lambda: self.save_patient(dialog))
+        save_button.clicked.connect(self.save_patient)
         layout.addWidget(save_button)
 
-        dialog.setLayout(layout)
-        dialog.exec_()
+        self.setLayout(layout)
 
-    def save_patient(self, dialog):
+    def save_patient(self):
         first_name = self.first_name_input.text()
         last_name = self.last_name_input.text()
         number = self.number_input.text()
 
-        patients = self.read_json(PATIENTS_FILE)
-        if any(patient['number'] == number for patient in patients):
-            QMessageBox.warning(self, "Error", "NUMBER already exists.")
-            return
+        self.data_worker.change(lambda model: model.add_patient(number, first_name, last_name),
+                                lambda status: self.patient_saved(status, first_name, last_name))
 
-        patients.append({
-            'first_name': first_name,
-            'last_name': last_name,
-            'number': number
-        })
-        self.write_json(PATIENTS_FILE, patients)
-        QMessageBox.information(self, "Patient Added", f"Patient {first_name} {last_name} added successfully.")
-        dialog.accept()
+    def patient_saved(self, status, first_name, last_name):
+        if show_status(self, status, "PATIENT HAS BEEN ADDED",
+                       "Patient Added", f"Patient {first_name} {last_name} added successfully."):
+            self.first_name_input.clear()
+            self.last_name_input.clear()
+            self.number_input.clear()
+            self.accept()
 
-    def add_appointment(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Schedule Appointment")
+
+class AddAppointmentDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Schedule Appointment")
 
         layout = QVBoxLayout()
 
@@ -170,122 +556,94 @@ class UserInterface(QMainWindow):
         self.time_input = QTimeEdit()
         self.time_input.setTime(QTime.currentTime())
         layout.addWidget(self.time_input)
+
+        duration_label = QLabel("Duration (minutes):")
+        layout.addWidget(duration_label)
+        self.duration_input = QSpinBox()
+        self.duration_input.setRange(1, 480)
+        self.duration_input.setValue(model_entities.DEFAULT_DURATION)
+        layout.addWidget(self.duration_input)
+
         description_label = QLabel("Appointment Description:")
         layout.addWidget(description_label)
         self.description_input = QTextEdit()
         layout.addWidget(self.description_input)
 
         save_button = QPushButton("Schedule")
-        save_button.clicked.connect(lambda: self.save_appointment(dialog))
+        save_button.clicked.connect(self.save_appointment)
         layout.addWidget(save_button)
 
-        dialog.setLayout(layout)
-        dialog.exec_()
+        self.setLayout(layout)
 
-    def save_appointment(self, dialog):
+    def save_appointment(self):
         number = self.number_input.text()
-        date = self.date_input.date().toString("yyyy-MM-dd")
-        time = self.time_input.time().toString("HH:mm:ss")
+        date = qt_date(self.date_input)
+        time = qt_time(self.time_input)
+        duration = self.duration_input.value()
         description = self.description_input.toPlainText()
 
-        patients = self.read_json(PATIENTS_FILE)
-        if not any(patient['number'] == number for patient in patients):
-            QMessageBox.warning(self, "Error", "Patient not found.")
-            return
-
-        appointments = self.read_json(APPOINTMENTS_FILE)
-        appointments.append({
-            'patient_number': number,
-            'appointment_date': date,
-            'appointment_time': time,
-            'description': description
-        })
-        self.write_json(APPOINTMENTS_FILE, appointments)
-        QMessageBox.information(self, "Appointment Scheduled", f"Appointment for {number} scheduled on {date} at {time}.")
-        dialog.accept()
-
-    def print_all_appointments(self):
-        appointments = self.read_json(APPOINTMENTS_FILE)
-
-        dialog = QDialog(self)
-        dialog.setWindowTitle("All Appointments")
-
-        layout = QVBoxLayout()
-        if appointments:
-            list_widget = QListWidget()
-            for appt in appointments:
-                number = appt['patient_number']
-                date = appt['appointment_date']
-                time = appt['appointment_time']
-                description = appt['description']
-                list_widget.addItem(f"NUMBER: {number}, Date: {date}, Time: {time}, Description: {description}")
-            layout.addWidget(list_widget)
-        else:
-            layout.addWidget(QLabel("No scheduled appointments."))
-
-        close_button = QPushButton("Close")
-        close_button.clicked.connect(dialog.accept)
-        layout.addWidget(close_button)
+        self.data_worker.change(lambda model: model.add_appointment(number, date, time, description, duration),
+                                lambda status: self.appointment_saved(status, number, date, time))
 
-        dialog.setLayout(layout)
-        dialog.exec_()
+    def appointment_saved(self, status, number, date, time):
+        if show_status(self, status, "APPOINTMENT HAS BEEN ADDED",
+                       "Appointment Scheduled", f"Appointment for {number} scheduled on {date} at {time}."):
+            self.number_input.clear()
+            self.description_input.clear()
+            self.accept()
 
-    def show_patient_window(self):
-        patients = self.read_json(PATIENTS_FILE)
-        dialog = PatientDialog(patients)
-        dialog.exec_()
 
-    def show_daily_appointments_window(self):
-        dialog = DailyAppointmentsDialog()
-        dialog.exec_()
-
-    def show_patient_appointments_window(self):
-        dialog = PatientAppointmentsDialog()
-        dialog.exec_()
-
-    def delete_patient(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Delete Patient")
+class DeletePatientDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Delete Patient")
 
         layout = QVBoxLayout()
 
-        number_label = QLabel("Patient's NUMBER:")
-        layout.addWidget(number_label)
-        self.number_input = QLineEdit()
-        layout.addWidget(self.number_input)
+        self.patient_picker = PatientPicker(data_worker)
+        layout.addWidget(self.patient_picker)
+        self.number_input = self.patient_picker.number_input
 
         delete_button = QPushButton("Delete")
-        delete_button.clicked.connect(lambda: self.remove_patient(dialog))
+        delete_button.clicked.connect(self.remove_patient)
         layout.addWidget(delete_button)
 
-        dialog.setLayout(layout)
-        dialog.exec_()
+        self.setLayout(layout)
 
-    def remove_patient(self, dialog):
+    def remove_patient(self):
         number = self.number_input.text()
 
-        patients = self.read_json(PATIENTS_FILE)
-        appointments = self.read_json(APPOINTMENTS_FILE)
-
-        patients = [patient for patient in patients if patient['number'] != number]
-        appointments = [appt for appt in appointments if appt['patient_number'] != number]
+        # Appointments of the deleted patient are kept with 'patient_deleted' number, as in the console app
+        self.data_worker.change(lambda model: model.delete_patient(number),
+                                lambda status: self.patient_removed(status, number))
 
-        self.write_json(PATIENTS_FILE, patients)
-        self.write_json(APPOINTMENTS_FILE, appointments)
+    def patient_removed(self, status, number):
+        if show_status(self, status, "PATIENT HAS BEEN DELETED",
+                       "Patient Deleted", f"Patient with NUMBER {number} has been deleted."):
+            self.number_input.clear()
+            self.accept()
 
-        QMessageBox.information(self, "Patient Deleted", f"Patient with NUMBER {number} and their appointments have been deleted.")
-        dialog.accept()
 
-    def cancel_appointment(self):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Cancel Appointment")
+class CancelAppointmentDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Cancel Appointment")
 
         layout = QVBoxLayout()
 
-        number_label = QLabel("Patient's NUMBER:")
-        layout.addWidget(number_label)
-        self.number_input = QLineEdit()
-        layout.addWidget(self.number_input)
+        self.patient_picker = PatientPicker(data_worker)
+        self.patient_picker.patient_selected.connect(self.show_patient_appointments)
+        layout.addWidget(self.patient_picker)
+        self.number_input = self.patient_picker.number_input
+
+        # Appointments of the selected patient, a clicked one fills date and time
+        self.appointments_view = QListView()
+        self.appointments_view.setUniformItemSizes(True)
+        self.appointments_view.clicked.connect(self.select_appointment)
+        self.appointments_view.hide()
+        layout.addWidget(self.appointments_view)
 
         date_label = QLabel("Appointment Date:")
         layout.addWidget(date_label)
@@ -301,44 +659,88 @@ class UserInterface(QMainWindow):
         layout.addWidget(self.time_input)
 
         delete_button = QPushButton("Cancel Appointment")
-        delete_button.clicked.connect(lambda: self.remove_appointment(dialog))
+        delete_button.clicked.connect(self.remove_appointment)
         layout.addWidget(delete_button)
 
-        dialog.setLayout(layout)
-        dialog.exec_()
-
+        self.setLayout(layout)
 
-    def remove_appointment(self, dialog):
+    def show_patient_appointments(self, patient):
+        old_model = self.appointments_view.model()
+        if old_model is not None:
+            old_model.cancel()
+        number = patient.number
+        list_model = RecordListModel(self.data_worker,
+                                     iterator_pages(lambda model: model.get_appointments_by_number(number) or []),
+                                     format_patient_appointment)
+        self.appointments_view.setModel(list_model)
+        self.appointments_view.show()
+        list_model.fetchMore(QModelIndex())
+
+    def select_appointment(self, index):
+        appointment = self.appointments_view.model().records[index.row()]
+        self.date_input.setDate(QDate(appointment.date))
+        self.time_input.setTime(QTime(appointment.time))
+
+    def remove_appointment(self):
         number = self.number_input.text()
-        date = self.date_input.date().toString("yyyy-MM-dd")
-        time = self.time_input.time().toString("HH:mm:ss")
+        date = qt_date(self.date_input)
+        time = qt_time(self.time_input)
 
-        appointments = self.read_json(APPOINTMENTS_FILE)
-        appointments = [appt for appt in appointments if not (appt['patient_number'] == number and appt['appointment_date'] == date and appt['appointment_time'] == time)]
+        def cancel(model):
+            appointment = model.get_busy_appointment(date, time)
+            if appointment is None or appointment.patient_number != number:
+                return "THE PATIENT DOES NOT HAVE AN APPOINTMENT AT THE SELECTED TIME"
+            return model.delete_appointment(date, time)
 
-        self.write_json(APPOINTMENTS_FILE, appointments)
+        self.data_worker.change(cancel, lambda status: self.appointment_removed(status, number, date, time))
 
-        QMessageBox.information(self, "Appointment Canceled", f"Appointment for {number} on {date} at {time} has been canceled.")
-        dialog.accept()
+    def appointment_removed(self, status, number, date, time):
+        if show_status(self, status, "APPOINTMENT HAS BEEN CANCELED",
+                       "Appointment Canceled", f"Appointment for {number} on {date} at {time} has been canceled."):
+            self.appointments_view.hide()
+            self.accept()
 
-class PatientDialog(QDialog):
-    def __init__(self, patients):
-        super().__init__()
+
+class PatientDialog(RecordsDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(data_worker, format_patient, "No registered patients.", parent)
         self.setWindowTitle("Registered Patients")
 
+    def showEvent(self, event):
+        self.set_records(lambda model, cursor, page_size: model.get_patients_page(cursor, page_size))
+        super().showEvent(event)
+
+
+class AllAppointmentsDialog(RecordsDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(data_worker, format_appointment, "No scheduled appointments.", parent)
+        self.setWindowTitle("All Appointments")
+
+    def showEvent(self, event):
+        self.set_records(lambda model, cursor, page_size: model.get_appointments_page(cursor, page_size))
+        super().showEvent(event)
+
+
+class SearchPatientsDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Search Patients")
+
         layout = QVBoxLayout()
-        list_widget = QListWidget()
-
-        if patients:
-            for patient in patients:
-                first_name = patient['first_name']
-                last_name = patient['last_name']
-                number = patient['number']
-                list_widget.addItem(f"{first_name} {last_name}, NUMBER: {number}")
-        else:
-            list_widget.addItem("No registered patients.")
 
-        layout.addWidget(list_widget)
+        name_label = QLabel("Patient's Name:")
+        layout.addWidget(name_label)
+        self.name_input = QLineEdit()
+        self.name_input.returnPressed.connect(self.show_patients)
+        layout.addWidget(self.name_input)
+
+        search_button = QPushButton("Search")
+        search_button.clicked.connect(self.show_patients)
+        layout.addWidget(search_button)
+
+        self.list_widget = QListWidget()
+        layout.addWidget(self.list_widget)
 
         close_button = QPushButton("Close")
         close_button.clicked.connect(self.accept)
@@ -346,17 +748,29 @@ class PatientDialog(QDialog):
 
         self.setLayout(layout)
 
-    
+    def show_patients(self):
+        text = self.name_input.text()
+        self.data_worker.run(lambda model: model.search_patients(text), self.patients_found)
+
+    def patients_found(self, patients):
+        self.list_widget.clear()
+        if not patients:
+            self.list_widget.addItem("No matching patients.")
+        for patient in patients:
+            self.list_widget.addItem(format_patient(patient))
+
+
 class PatientAppointmentsDialog(QDialog):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
         self.setWindowTitle("Select Patient")
         layout = QVBoxLayout()
 
-        number_label = QLabel("Patient's NUMBER:")
-        layout.addWidget(number_label)
-        self.number_input = QLineEdit()
-        layout.addWidget(self.number_input)
+        self.patient_picker = PatientPicker(data_worker)
+        self.patient_picker.patient_selected.connect(lambda patient: self.show_patient_appointments())
+        layout.addWidget(self.patient_picker)
+        self.number_input = self.patient_picker.number_input
 
         fetch_button = QPushButton("Fetch Appointments")
         fetch_button.clicked.connect(self.show_patient_appointments)
@@ -367,39 +781,28 @@ class PatientAppointmentsDialog(QDialog):
         layout.addWidget(close_button)
 
         self.setLayout(layout)
+        self.appointments_dialog = RecordsDialog(data_worker, format_patient_appointment,
+                                                 "No appointments for this patient.", self)
 
     def show_patient_appointments(self):
         number = self.number_input.text()
-        appointments = UserInterface().read_json(APPOINTMENTS_FILE)
-        patient_appointments = [appt for appt in appointments if appt['patient_number'] == number]
-
-        appointment_dialog = QDialog(self)
-        appointment_dialog.setWindowTitle(f"Appointments for {number}")
+        self.data_worker.run(lambda model: model.get_appointments_by_number(number),
+                             lambda patient_appointments: self.appointments_found(number, patient_appointments))
 
-        layout = QVBoxLayout()
-        if patient_appointments:
-            list_widget = QListWidget()
-            for appt in patient_appointments:
-                date = appt['appointment_date']
-                time = appt['appointment_time']
-                description = appt['description']
-                list_widget.addItem(f"Date: {date}, Time: {time}, Description: {description}")
-            layout.addWidget(list_widget)
-        else:
-            layout.addWidget(QLabel("No appointments for this patient."))
-
-        close_button = QPushButton("Close")
-        close_button.clicked.connect(appointment_dialog.accept)
-        layout.addWidget(close_button)
+    def appointments_found(self, number, patient_appointments):
+        if patient_appointments is None:
+            QMessageBox.warning(self, "Error", "Patient not found.")
+            return
 
-        appointment_dialog.setLayout(layout)
-        appointment_dialog.exec_()
+        self.appointments_dialog.show_records(f"Appointments for {number}",
+                                              iterator_pages(lambda model: patient_appointments))
         self.accept()
 
-        
+
 class DailyAppointmentsDialog(QDialog):
-    def __init__(self):
-        super().__init__()
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
         self.setWindowTitle("Select Date")
 
         layout = QVBoxLayout()
@@ -419,40 +822,197 @@ class DailyAppointmentsDialog(QDialog):
         layout.addWidget(close_button)
 
         self.setLayout(layout)
+        self.appointments_dialog = RecordsDialog(data_worker, format_day_appointment,
+                                                 "No appointments for this date.", self)
 
     def show_appointments(self):
-        date = self.date_input.date().toString("yyyy-MM-dd")
-        appointments = UserInterface().read_json(APPOINTMENTS_FILE)
-        daily_appointments = [appt for appt in appointments if appt['appointment_date'] == date]
+        date = qt_date(self.date_input)
+        self.appointments_dialog.show_records(f"Appointments on {date}",
+                                              iterator_pages(lambda model: model.get_appointments_by_date(date)))
+        self.accept()
+
 
-        appointment_dialog = QDialog(self)
-        appointment_dialog.setWindowTitle(f"Appointments on {date}")
+class PeriodAppointmentsDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Select Period")
 
         layout = QVBoxLayout()
-        if daily_appointments:
-            list_widget = QListWidget()
-            for appt in daily_appointments:
-                number = appt['patient_number']
-                time = appt['appointment_time']
-                description = appt['description']
-                list_widget.addItem(f"NUMBER: {number}, Time: {time}, Description: {description}")
-            layout.addWidget(list_widget)
-        else:
-            layout.addWidget(QLabel("No appointments for this date."))
+
+        first_date_label = QLabel("First Date:")
+        layout.addWidget(first_date_label)
+        self.first_date_input = QDateEdit(calendarPopup=True)
+        self.first_date_input.setDate(QDate.currentDate())
+        layout.addWidget(self.first_date_input)
+
+        last_date_label = QLabel("Last Date:")
+        layout.addWidget(last_date_label)
+        self.last_date_input = QDateEdit(calendarPopup=True)
+        self.last_date_input.setDate(QDate.currentDate().addDays(6))
+        layout.addWidget(self.last_date_input)
+
+        fetch_button = QPushButton("Fetch Appointments")
+        fetch_button.clicked.connect(self.show_appointments)
+        layout.addWidget(fetch_button)
 
         close_button = QPushButton("Close")
-        close_button.clicked.connect(appointment_dialog.accept)
+        close_button.clicked.connect(self.accept)
         layout.addWidget(close_button)
 
-        appointment_dialog.setLayout(layout)
-        appointment_dialog.exec_()
+        self.setLayout(layout)
+        self.appointments_dialog = RecordsDialog(data_worker, format_appointment,
+                                                 "No appointments in this period.", self)
+
+    def show_appointments(self):
+        first_date = qt_date(self.first_date_input)
+        last_date = qt_date(self.last_date_input)
+        start, end = days_period(first_date, last_date)
+
+        # Appointments are streamed from the date index as the list is scrolled.
+        self.appointments_dialog.show_records(f"Appointments from {first_date} to {last_date}",
+                                              iterator_pages(lambda model: model.get_appointments_between(start, end)))
         self.accept()
-        
-def main():
-    app = QApplication(sys.argv)
-    ui = UserInterface()
+
+
+class FreeSlotsDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Find Free Time Slots")
+
+        layout = QVBoxLayout()
+
+        date_label = QLabel("First Date:")
+        layout.addWidget(date_label)
+        self.date_input = QDateEdit(calendarPopup=True)
+        self.date_input.setDate(QDate.currentDate())
+        layout.addWidget(self.date_input)
+
+        count_label = QLabel("Number of Slots:")
+        layout.addWidget(count_label)
+        self.count_input = QSpinBox()
+        self.count_input.setRange(1, 100)
+        self.count_input.setValue(10)
+        layout.addWidget(self.count_input)
+
+        length_label = QLabel("Slot Length (minutes):")
+        layout.addWidget(length_label)
+        self.length_input = QSpinBox()
+        self.length_input.setRange(5, 240)
+        self.length_input.setValue(15)
+        layout.addWidget(self.length_input)
+
+        find_button = QPushButton("Find Free Slots")
+        find_button.clicked.connect(self.show_free_slots)
+        layout.addWidget(find_button)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+        self.setLayout(layout)
+        self.slots_dialog = RecordsDialog(data_worker, format_slot, "No free time slots.", self)
+
+    def show_free_slots(self):
+        first_date = qt_date(self.date_input)
+        count = self.count_input.value()
+        slot_length = self.length_input.value()
+        self.slots_dialog.show_records(f"Free Time Slots from {first_date}",
+                                       iterator_pages(lambda model: model.find_free_slots(first_date, count, slot_length)))
+        self.accept()
+
+
+class ExportDialog(QDialog):
+    def __init__(self, data_worker, parent=None):
+        super().__init__(parent)
+        self.data_worker = data_worker
+        self.setWindowTitle("Export Data")
+
+        layout = QVBoxLayout()
+
+        kind_label = QLabel("Export:")
+        layout.addWidget(kind_label)
+        self.kind_input = QComboBox()
+        self.kind_input.addItems(["appointments", "patients"])
+        layout.addWidget(self.kind_input)
+
+        format_label = QLabel("File Format:")
+        layout.addWidget(format_label)
+        self.format_input = QComboBox()
+        self.format_input.addItems(["csv", "jsonl", "ics"])
+        layout.addWidget(self.format_input)
+
+        self.period_input = QCheckBox("Only appointments between dates")
+        layout.addWidget(self.period_input)
+
+        first_date_label = QLabel("First Date:")
+        layout.addWidget(first_date_label)
+        self.first_date_input = QDateEdit(calendarPopup=True)
+        self.first_date_input.setDate(QDate.currentDate())
+        layout.addWidget(self.first_date_input)
+
+        last_date_label = QLabel("Last Date:")
+        layout.addWidget(last_date_label)
+        self.last_date_input = QDateEdit(calendarPopup=True)
+        self.last_date_input.setDate(QDate.currentDate().addDays(30))
+        layout.addWidget(self.last_date_input)
+
+        export_button = QPushButton("Export")
+        export_button.clicked.connect(self.export_data)
+        layout.addWidget(export_button)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+        self.setLayout(layout)
+
+    def export_data(self):
+        kind = self.kind_input.currentText()
+        file_format = self.format_input.currentText()
+        if file_format == "ics" and kind != "appointments":
+            QMessageBox.warning(self, "Error", "Only appointments can be exported to iCalendar.")
+            return
+
+        filename, _ = QFileDialog.getSaveFileName(self, "Export Data", f"{kind}.{file_format}")
+        if not filename:
+            return
+
+        start, end = datetime.datetime.min, datetime.datetime.max
+        if self.period_input.isChecked():
+            start, end = days_period(qt_date(self.first_date_input), qt_date(self.last_date_input))
+
+        def export(model):
+            if kind == "patients":
+                objects = model.get_all_registered_patients()
+            else:
+                objects = model.get_appointments_between(start, end)
+            return bulk_export.export_file(kind, filename, file_format, objects, model.get_patient_by_number)
+
+        self.data_worker.run(export, lambda count: self.data_exported(count, kind, filename),
+                             lambda error: QMessageBox.warning(self, "Error", f"Export failed: {error}"))
+
+    def data_exported(self, count, kind, filename):
+        QMessageBox.information(self, "Data Exported", f"{count} {kind} exported to {filename}.")
+        self.accept()
+
+
+def main(window_class=UserInterface):
+    # The data directory has to be opened with the same options as the console app using it.
+    parser = argparse.ArgumentParser(description="Patient Register App for doctors.")
+    add_storage_arguments(parser)
+    args, qt_arguments = parser.parse_known_args()
+    if args.storage == "sharded" and args.persistence == "journal":
+        parser.error("the sharded storage does not support the journal persistence")
+    app = QApplication(sys.argv[:1] + qt_arguments)
+    data_service = DataService(args.storage, args.persistence, args.durability, DATA_DIR)
+    ui = window_class(data_service)
     ui.show()
-    sys.exit(app.exec_())
+    exit_code = app.exec_()
+    ui.data_worker.wait_for_done()
+    data_service.close()
+    sys.exit(exit_code)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,153 @@
+import json
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """
+    A class that represents advisory lock of a lock file, shared by all processes (the console app,
+    GUI apps on other terminals) and threads using the same data directory. The lock is re-entrant
+    for the thread holding it and it can be released by another thread (e.g. a background thread
+    finishing the work started with the lock). The lock file also stores small json data
+    (versions of data files), which have to be read and written with the lock held.
+
+    Attributes
+    ----------
+        filename: str
+            relative path for the lock file
+        lock_file: file
+            unbuffered lock file opened for reading and writing, locked with flock (or msvcrt.locking on Windows)
+        thread_lock: Lock
+            lock of threads in this process, the file lock does not exclude them
+        owner: int | None
+            identifier of the thread holding the lock, None if it is not held
+        depth: int
+            number of nested acquisitions by the thread holding the lock
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        # Data written by other processes have to be read from the file, not from a buffer.
+        self.lock_file = open(filename, "a+b", buffering=0)
+        self.thread_lock = threading.Lock()
+        self.owner = None
+        self.depth = 0
+
+    def acquire(self, blocking=True):
+        """
+        Acquire the lock.
+
+        Arguments:
+            blocking (bool): wait until the lock is released by other processes and threads
+
+        Returns:
+            acquired (bool): False if the lock is held by someone else and blocking is False
+        """
+
+        if self.owner == threading.get_ident():
+            self.depth += 1
+            return True
+
+        if not self.thread_lock.acquire(blocking):
+            return False
+
+        if not self.lock_process(blocking):
+            self.thread_lock.release()
+            return False
+
+        self.owner = threading.get_ident()
+        self.depth = 1
+        return True
+
+    def release(self):
+        """ Release one acquisition of the lock, the lock is unlocked when the outermost one is released. """
+
+        self.depth -= 1
+        if self.depth == 0:
+            self.owner = None
+            self.unlock_process()
+            self.thread_lock.release()
+
+    def lock_process(self, blocking):
+        """
+        Lock the lock file, so other processes cannot hold the lock.
+
+        Arguments:
+            blocking (bool): wait until the lock file is unlocked by other processes
+
+        Returns:
+            locked (bool): False if the lock file is locked by another process and blocking is False
+        """
+
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            return True
+
+        # msvcrt locks a byte range, the first byte is used (it does not have to exist).
+        while True:
+            self.lock_file.seek(0)
+            try:
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            except OSError:
+                if not blocking:
+                    return False
+                time.sleep(0.01)
+            else:
+                return True
+
+    def unlock_process(self):
+        """ Unlock the lock file for other processes. """
+
+        if fcntl is not None:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+        else:
+            self.lock_file.seek(0)
+            msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def read_data(self):
+        """
+        Read data stored in the lock file. Call it with the lock held.
+
+        Returns:
+            data (dict): stored data, empty if the file is empty or was not written completely
+        """
+
+        self.lock_file.seek(0)
+        try:
+            data = json.loads(self.lock_file.read() or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def write_data(self, data):
+        """
+        Store data in the lock file. Call it with the lock held.
+
+        Arguments:
+            data (dict): json serializable data
+        """
+
+        self.lock_file.seek(0)
+        self.lock_file.truncate()
+        self.lock_file.write(json.dumps(data).encode("utf8"))
+
+    def close(self):
+        """ Close the lock file. """
+
+        self.lock_file.close()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,81 @@
+import threading
+
+
+class GroupCommit:
+    """
+    A class that groups changes made by many operations into one flush to disk.
+
+    Durability modes:
+        - operation: flush after every operation
+        - coalesced: flush after `max_operations` operations or `max_delay_ms` milliseconds
+          after the first operation which is not flushed yet
+        - exit: flush only when the app exits
+
+    Attributes
+    ----------
+        flush: callable
+            function writing pending changes to disk
+        mode: str
+            durability mode
+        max_operations: int
+            number of operations flushed together in coalesced mode
+        max_delay_ms: int
+            maximal delay of the flush in coalesced mode
+        pending_operations: int
+            number of operations which are not flushed yet
+        timer: Timer | None
+            timer of the delayed flush in coalesced mode
+        lock: Lock
+            lock held during the flush, hold it to change files written by the flush
+    """
+
+    MODES = ("operation", "coalesced", "exit")
+
+    def __init__(self, flush, mode="operation", max_operations=100, max_delay_ms=200):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown durability mode: {mode}")
+
+        self.flush = flush
+        self.mode = mode
+        self.max_operations = max_operations
+        self.max_delay_ms = max_delay_ms
+        self.pending_operations = 0
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def operation_done(self):
+        """ Register finished operation and flush changes if the durability mode requires it. """
+
+        with self.lock:
+            self.pending_operations += 1
+            if self.mode == "operation" or \
+                    (self.mode == "coalesced" and self.pending_operations >= self.max_operations):
+                self.flush_pending()
+            elif self.mode == "coalesced" and self.timer is None:
+                self.timer = threading.Timer(self.max_delay_ms / 1000, self.commit)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self):
+        """ Flush all pending changes now. """
+
+        with self.lock:
+            self.flush_pending()
+
+    def flush_pending(self):
+        """ Flush pending changes. The lock has to be held by the caller. """
+
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if self.pending_operations == 0:
+            return
+
+        self.flush()
+        self.pending_operations = 0
+
+    def close(self):
+        """ Flush pending changes and stop the delayed flush. Call it before the app exits. """
+
+        self.commit()
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+
+import helper_classes.json_service as json_service
+
+
+def decode_record(line):
+    """
+    Decode journal record, its date and time are parsed like in json files of the app data.
+
+    Arguments:
+        line (str | bytes): JSON Lines record
+
+    Returns:
+        record (dict): operation name and its arguments
+    """
+
+    record = json.loads(line)
+    if "date" in record:
+        record["date"] = json_service.parse_date(record["date"])
+    if "time" in record:
+        record["time"] = json_service.parse_time(record["time"])
+    return record
+
+
+def read_records(filename):
+    """
+    Read journal records one by one from JSON Lines file.
+
+    Arguments:
+        filename (str): relative path for journal file
+
+    Returns:
+        records (generator of dict): journal records in written order
+    """
+
+    if not os.path.exists(filename):
+        return
+
+    with open(filename, "rt", encoding="utf8") as journal_file:
+        for line in journal_file:
+            # Last line can be cut off by a crash in the middle of an append.
+            if not line.endswith("\n"):
+                return
+            yield decode_record(line)
+
+
+class Journal:
+    """
+    A class that represents append-only log of model changes (JSON Lines file).
+    Every add/delete operation is stored as one small record, so the cost of saving
+    a change does not depend on the number of registered patients and appointments.
+
+    Attributes
+    ----------
+        filename: str
+            relative path for the active journal file
+        compacting_filename: str
+            relative path for the journal part which is being compacted into json files
+        records_count: int
+            number of records not compacted yet
+        read_offset: int
+            size of the active journal part which is already applied to the model,
+            records appended after it by other processes are read by read_new_records
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.compacting_filename = filename + ".compacting"
+        self.records_count = 0
+        self.read_offset = 0
+        self.drop_torn_record()
+        self.journal_file = open(filename, "at", encoding="utf8")
+
+    def drop_torn_record(self):
+        """ Cut off the last record if it was not written completely, so new records start on a new line. """
+
+        if not os.path.exists(self.filename):
+            return
+
+        with open(self.filename, "rb+") as journal_file:
+            content = journal_file.read()
+            if content and not content.endswith(b"\n"):
+                journal_file.truncate(content.rfind(b"\n") + 1)
+
+    def append(self, operation, **arguments):
+        """
+        Append one record to the journal.
+
+        Arguments:
+            operation (str): name of the ModelManager operation
+            arguments (dict): arguments of the operation
+        """
+
+        record = {"operation": operation, **arguments}
+        self.journal_file.write(json.dumps(record, default=json_service.json_serializer) + "\n")
+        self.journal_file.flush()
+        self.records_count += 1
+        # Appends are made with the data lock held by a model which is up to date, so nothing is skipped.
+        self.read_offset = os.fstat(self.journal_file.fileno()).st_size
+
+    def read_new_records(self):
+        """
+        Read records appended to the active journal by other processes since the last read or append.
+
+        Returns:
+            records (list[dict]): new complete records in written order
+        """
+
+        if not os.path.exists(self.filename) or os.path.getsize(self.filename) <= self.read_offset:
+            return []
+
+        with open(self.filename, "rb") as journal_file:
+            journal_file.seek(self.read_offset)
+            content = journal_file.read()
+        # Last line can be cut off by an append which is not finished yet.
+        content = content[:content.rfind(b"\n") + 1]
+        self.read_offset += len(content)
+        return [decode_record(line) for line in content.splitlines()]
+
+    def sync(self):
+        """ Force appended records from OS buffers to disk. """
+
+        self.journal_file.flush()
+        os.fsync(self.journal_file.fileno())
+
+    def rotate(self):
+        """
+        Move the active journal aside for compaction and start a new empty journal.
+        Records left by a failed compaction are kept and compacted together with the current ones.
+        """
+
+        self.sync()
+        self.journal_file.close()
+        if os.path.exists(self.compacting_filename):
+            with open(self.filename, "rt", encoding="utf8") as journal_file, \
+                    open(self.compacting_filename, "at", encoding="utf8") as compacting_file:
+                shutil.copyfileobj(journal_file, compacting_file)
+                compacting_file.flush()
+                os.fsync(compacting_file.fileno())
+            os.remove(self.filename)
+        else:
+            os.replace(self.filename, self.compacting_filename)
+
+        self.records_count = 0
+        self.read_offset = 0
+        self.journal_file = open(self.filename, "at", encoding="utf8")
+
+    def finish_compaction(self):
+        """ Remove the compacted journal part. Call it after json files are written. """
+
+        if os.path.exists(self.compacting_filename):
+            os.remove(self.compacting_filename)
+
+    def close(self):
+        """ Close the active journal file. """
+
+        self.journal_file.close()
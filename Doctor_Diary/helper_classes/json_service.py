@@ -1,4 +1,5 @@
 import datetime
+import functools
 import services.model_entities
 
 
@@ -18,11 +19,99 @@ def json_serializer(obj):
             'patient_number': obj.patient_number,
             'date': obj.date,
             'time': obj.time,
-            'description': obj.description
+            'description': obj.description,
+            'duration': obj.duration
         }
     raise TypeError(f"Type {type(obj)} is not serializable")
 
 
+@functools.lru_cache(maxsize=None)
+def parse_date(text):
+    """
+    Parse [YYYY-MM-DD] formatted date. Parsed dates are cached, so all appointments
+    on the same day share one date object (there are only a few thousand different days).
+
+    Arguments:
+        text (str): ISO formatted date
+
+    Returns:
+        date (date): parsed date
+    """
+
+    return datetime.date.fromisoformat(text)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_time(text):
+    """
+    Parse [HH:MM:SS] formatted time. Parsed times are cached like dates. Fractions of a second
+    are dropped, appointments are kept with second precision by every storage.
+
+    Arguments:
+        text (str): ISO formatted time
+
+    Returns:
+        time (time): parsed time
+    """
+
+    return datetime.time.fromisoformat(text).replace(microsecond=0)
+
+
+# Keys written by older versions of the GUI app, renamed to the keys used by the serializer.
+LEGACY_PATIENT_KEYS = {'first_name': 'firstname', 'last_name': 'lastname'}
+LEGACY_APPOINTMENT_KEYS = {'appointment_date': 'date', 'appointment_time': 'time'}
+
+
+def rename_legacy_keys(record, legacy_keys):
+    """
+    Rename keys of the record written by an older version of the app, so all records have the serializer keys.
+
+    Arguments:
+        record (dict): patient or appointment record loaded from json
+        legacy_keys (dict[str, str]): new keys keyed by old ones
+
+    Returns:
+        record (dict): the same record with new keys
+    """
+
+    for old_key, new_key in legacy_keys.items():
+        if old_key in record:
+            record[new_key] = record.pop(old_key)
+    return record
+
+
+def patient_deserializer(json_patient):
+    """
+    Get patient record loaded from json with the serializer keys.
+
+    Arguments:
+        json_patient (dict): patient record in the current or the legacy format
+
+    Returns:
+        json_patient (dict): the same record with number, firstname and lastname
+    """
+
+    return rename_legacy_keys(json_patient, LEGACY_PATIENT_KEYS)
+
+
+def appointment_deserializer(json_appointment):
+    """
+    Decode date and time of the appointment record loaded from json (without object_hook).
+
+    Arguments:
+        json_appointment (dict): appointment record in the current or the legacy format
+        with ISO formatted date and time
+
+    Returns:
+        json_appointment (dict): the same record with the serializer keys and date and time objects
+    """
+
+    rename_legacy_keys(json_appointment, LEGACY_APPOINTMENT_KEYS)
+    json_appointment['date'] = parse_date(json_appointment['date'])
+    json_appointment['time'] = parse_time(json_appointment['time'])
+    return json_appointment
+
+
 def json_deserializer(obj):
     if 'date' in obj:
         obj['date'] = datetime.datetime.strptime(obj['date'], '%Y-%m-%d').date()
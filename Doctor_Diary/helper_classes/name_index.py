@@ -0,0 +1,267 @@
+import bisect
+import heapq
+import unicodedata
+from collections import Counter
+
+
+def normalize_name(name):
+    """
+    Normalize name for searching: case and accents are ignored ('Łódź' and 'lodz' are the same).
+
+    Arguments:
+        name (str): first name, last name or searched text
+
+    Returns:
+        name (str): lower case name without diacritics
+    """
+
+    decomposed = unicodedata.normalize("NFKD", name.casefold().replace("ł", "l"))
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def name_trigrams(word):
+    """
+    Get trigrams of the word padded with spaces (two before, one after), so short words
+    and word beginnings have their own trigrams.
+
+    Arguments:
+        word (str): normalized word
+
+    Returns:
+        trigrams (set[str]): trigrams of the word
+    """
+
+    padded = f"  {word} "
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def allowed_typos(word):
+    """
+    Get number of typos tolerated in the searched word, short words have to match exactly.
+
+    Arguments:
+        word (str): normalized searched word
+
+    Returns:
+        typos (int): maximal edit distance of matched names
+    """
+
+    if len(word) < 3:
+        return 0
+    if len(word) < 6:
+        return 1
+    return 2
+
+
+def edit_distance(first, second, limit):
+    """
+    Count edits (insertions, deletions, substitutions and transpositions of neighbours)
+    which change the first word into the second one.
+
+    Arguments:
+        first (str): first word
+        second (str): second word
+        limit (int): maximal interesting distance
+
+    Returns:
+        distance (int): edit distance, or limit + 1 if it is greater than limit
+    """
+
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+
+    previous_row, row = None, list(range(len(second) + 1))
+    for first_index, first_char in enumerate(first, 1):
+        before_previous_row, previous_row = previous_row, row
+        row = [first_index]
+        for second_index, second_char in enumerate(second, 1):
+            distance = min(previous_row[second_index] + 1, row[second_index - 1] + 1,
+                           previous_row[second_index - 1] + (first_char != second_char))
+            if (before_previous_row is not None and second_index > 1 and first_char == second[second_index - 2]
+                    and first[first_index - 2] == second_char):
+                distance = min(distance, before_previous_row[second_index - 2] + 1)
+            row.append(distance)
+        if min(row) > limit:
+            return limit + 1
+    return min(row[-1], limit + 1)
+
+
+class NameIndex:
+    """
+    A class that indexes first and last names of patients for prefix and typo tolerant search.
+    Prefixes are found by binary search in the sorted list of names, names with typos are found
+    by the trigram index and checked by edit distance. Both are updated on every added or deleted patient.
+
+    Attributes
+    ----------
+        patients: dict[str, Patient]
+            indexed patients keyed by number
+        names: list[(str, str)]
+            sorted (normalized name, patient number) pairs of first and last names
+        numbers_by_name: dict[str, set[str]]
+            numbers of patients keyed by normalized first or last name
+        names_by_trigram: dict[str, set[str]]
+            normalized names keyed by their trigrams
+    """
+
+    def __init__(self, patients=()):
+        """
+        Arguments:
+            patients (iterable of Patient): indexed patients
+        """
+
+        self.patients = {}
+        self.names = []
+        self.numbers_by_name = {}
+        self.names_by_trigram = {}
+        for patient in patients:
+            self.patients[patient.number] = patient
+            for name in self.patient_names(patient):
+                self.numbers_by_name.setdefault(name, set()).add(patient.number)
+                self.names.append((name, patient.number))
+        self.names.sort()
+        for name in self.numbers_by_name:
+            for trigram in name_trigrams(name):
+                self.names_by_trigram.setdefault(trigram, set()).add(name)
+
+    @staticmethod
+    def patient_names(patient):
+        """
+        Get normalized names of the patient.
+
+        Arguments:
+            patient (Patient): indexed patient
+
+        Returns:
+            names (set[str]): normalized first and last name (their parts for multi-part names)
+        """
+
+        return set(normalize_name(f"{patient.firstname} {patient.lastname}").replace("-", " ").split())
+
+    def add(self, patient):
+        """
+        Add patient names to the index.
+
+        Arguments:
+            patient (Patient): new patient
+        """
+
+        self.patients[patient.number] = patient
+        for name in self.patient_names(patient):
+            bisect.insort(self.names, (name, patient.number))
+            if name not in self.numbers_by_name:
+                self.numbers_by_name[name] = set()
+                for trigram in name_trigrams(name):
+                    self.names_by_trigram.setdefault(trigram, set()).add(name)
+            self.numbers_by_name[name].add(patient.number)
+
+    def remove(self, patient):
+        """
+        Remove patient names from the index.
+
+        Arguments:
+            patient (Patient): deleted patient
+        """
+
+        self.patients.pop(patient.number, None)
+        for name in self.patient_names(patient):
+            position = bisect.bisect_left(self.names, (name, patient.number))
+            if position < len(self.names) and self.names[position] == (name, patient.number):
+                del self.names[position]
+            numbers = self.numbers_by_name.get(name)
+            if numbers is None:
+                continue
+            numbers.discard(patient.number)
+            if not numbers:
+                del self.numbers_by_name[name]
+                for trigram in name_trigrams(name):
+                    trigram_names = self.names_by_trigram[trigram]
+                    trigram_names.discard(name)
+                    if not trigram_names:
+                        del self.names_by_trigram[trigram]
+
+    def update(self, patients):
+        """
+        Apply differences between the indexed patients and the current ones (e.g. loaded again
+        after other apps changed them), so the index is not built again.
+
+        Arguments:
+            patients (iterable of Patient): all current patients
+        """
+
+        current = {patient.number: patient for patient in patients}
+        for number, patient in list(self.patients.items()):
+            names = (patient.firstname, patient.lastname)
+            if number not in current or (current[number].firstname, current[number].lastname) != names:
+                self.remove(patient)
+        for number, patient in current.items():
+            if number not in self.patients:
+                self.add(patient)
+
+    def match_word(self, word):
+        """
+        Find patients with a name starting with the word or similar to it.
+
+        Arguments:
+            word (str): normalized searched word
+
+        Returns:
+            scores (dict[str, int]): best match score keyed by patient number
+            (0 for the same name, 1 for prefix, 2 + number of typos for similar names)
+        """
+
+        scores = {}
+        position = bisect.bisect_left(self.names, (word,))
+        while position < len(self.names) and self.names[position][0].startswith(word):
+            name, number = self.names[position]
+            scores[number] = 0 if name == word else min(scores.get(number, 1), 1)
+            position += 1
+
+        typos = allowed_typos(word)
+        if typos == 0:
+            return scores
+
+        # Every edit changes at most three trigrams, names with fewer shared trigrams are too different.
+        trigrams = name_trigrams(word)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self.names_by_trigram.get(trigram, ()))
+        required = max(1, len(trigrams) - 3 * typos)
+        for name, count in shared.items():
+            if count < required:
+                continue
+            distance = edit_distance(word, name, typos)
+            if distance > typos:
+                continue
+            for number in self.numbers_by_name[name]:
+                scores[number] = min(scores.get(number, 2 + distance), 2 + distance)
+        return scores
+
+    def search(self, text, limit=20):
+        """
+        Find patients whose names match every word of the searched text,
+        e.g. 'kowal' finds Kowalski and Kowalska, 'jan kowalsky' finds Jan Kowalski.
+
+        Arguments:
+            text (str): searched first name, last name or both
+            limit (int): maximal number of found patients
+
+        Returns:
+            numbers (str[]): numbers of found patients, best matches first
+        """
+
+        words = normalize_name(text).replace("-", " ").split()
+        if not words:
+            return []
+
+        totals = None
+        for word in words:
+            scores = self.match_word(word)
+            if totals is None:
+                totals = scores
+            else:
+                totals = {number: score + scores[number] for number, score in totals.items() if number in scores}
+            if not totals:
+                return []
+
+        return heapq.nsmallest(limit, totals, key=lambda number: (totals[number], number))
@@ -0,0 +1,177 @@
+import json
+import os
+import sys
+from array import array
+
+MAGIC = b"DDSNAP"
+VERSION = 4
+# Snapshot files are never unpickled (anyone who can write the shared data directory could run code in the app),
+# they contain a json header followed by typed arrays and utf8 encoded json lists of strings and numbers.
+HEADER_LENGTH_BYTES = 4
+
+
+def source_stamps(source_filenames):
+    """
+    Get size and modification time of the source files.
+
+    Arguments:
+        source_filenames (str[]): relative paths for source (json) files
+
+    Returns:
+        stamps (list[list]): [size, mtime in ns] of every source file
+    """
+
+    stamps = []
+    for filename in source_filenames:
+        stat = os.stat(filename)
+        stamps.append([stat.st_size, stat.st_mtime_ns])
+    return stamps
+
+
+def column_bytes(column):
+    """
+    Encode snapshot column.
+
+    Arguments:
+        column (array | bytes | list): typed array, raw bytes or json serializable list
+
+    Returns:
+        kind, data (str, bytes): array typecode, 'bytes' or 'json' and encoded column
+    """
+
+    if isinstance(column, array):
+        return column.typecode, column.tobytes()
+    if isinstance(column, (bytes, bytearray)):
+        return "bytes", bytes(column)
+    return "json", json.dumps(column, ensure_ascii=False, separators=(",", ":")).encode("utf8")
+
+
+def column_from_bytes(kind, data):
+    """
+    Decode snapshot column encoded by column_bytes.
+
+    Arguments:
+        kind (str): array typecode, 'bytes' or 'json'
+        data (bytes): encoded column
+
+    Returns:
+        column (array | bytes | list): decoded column
+    """
+
+    if kind == "bytes":
+        return data
+    if kind == "json":
+        return json.loads(data)
+    column = array(kind)
+    column.frombytes(data)
+    return column
+
+
+def write_snapshot(filename, kind, source_filenames, columns):
+    """
+    Save binary snapshot of the storage state made from the source files.
+
+    Arguments:
+        filename (str): relative path for snapshot file
+        kind (str): kind of the saved state (storage class name)
+        source_filenames (str[]): relative paths for files which contain the same data as the state
+        columns (dict[str, array | bytes | list]): entities of the storage as columns of primitive values
+    """
+
+    encoded_columns = [(name, *column_bytes(column)) for name, column in columns.items()]
+    header = {"kind": kind, "sources": source_stamps(source_filenames), "byteorder": sys.byteorder,
+              "columns": [[name, column_kind, len(data)] for name, column_kind, data in encoded_columns]}
+    encoded_header = json.dumps(header).encode("utf8")
+    temporary_filename = filename + ".tmp"
+    with open(temporary_filename, "wb") as snapshot_file:
+        snapshot_file.write(MAGIC + VERSION.to_bytes(2, "little"))
+        snapshot_file.write(len(encoded_header).to_bytes(HEADER_LENGTH_BYTES, "little"))
+        snapshot_file.write(encoded_header)
+        for name, column_kind, data in encoded_columns:
+            snapshot_file.write(data)
+        snapshot_file.flush()
+        os.fsync(snapshot_file.fileno())
+    os.replace(temporary_filename, filename)
+
+
+def read_current_header(snapshot_file, kind, source_filenames):
+    """
+    Read snapshot header and check that the snapshot is up to date.
+
+    Arguments:
+        snapshot_file (file): snapshot file opened for binary reading
+        kind (str): expected kind of the state (storage class name)
+        source_filenames (str[]): relative paths for source files of the snapshot
+
+    Returns:
+        header (dict | None): snapshot header, None if the snapshot has other version, kind or byte order,
+        or source files were changed after it was written
+    """
+
+    if snapshot_file.read(len(MAGIC) + 2) != MAGIC + VERSION.to_bytes(2, "little"):
+        return None
+    try:
+        header_length = int.from_bytes(snapshot_file.read(HEADER_LENGTH_BYTES), "little")
+        header = json.loads(snapshot_file.read(header_length))
+    except ValueError:
+        return None
+    if not isinstance(header, dict) or header.get("kind") != kind or header.get("byteorder") != sys.byteorder:
+        return None
+    if header.get("sources") != source_stamps(source_filenames):
+        return None
+    return header
+
+
+def snapshot_is_current(filename, kind, source_filenames):
+    """
+    Check that the snapshot exists and it is up to date, without loading the state.
+
+    Arguments:
+        filename (str): relative path for snapshot file
+        kind (str): expected kind of the state (storage class name)
+        source_filenames (str[]): relative paths for source files of the snapshot
+
+    Returns:
+        current (bool): True if the snapshot contains the same data as source files
+    """
+
+    if not os.path.exists(filename):
+        return False
+
+    with open(filename, "rb") as snapshot_file:
+        return read_current_header(snapshot_file, kind, source_filenames) is not None
+
+
+def read_snapshot(filename, kind, source_filenames):
+    """
+    Load binary snapshot of the storage state if it is up to date.
+
+    Arguments:
+        filename (str): relative path for snapshot file
+        kind (str): expected kind of the state (storage class name)
+        source_filenames (str[]): relative paths for source files of the snapshot
+
+    Returns:
+        columns (dict[str, array | bytes | list] | None): entities of the storage as columns or None
+        if the snapshot does not exist, is damaged, has other version or kind, or source files were changed
+        after it was written
+    """
+
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename, "rb") as snapshot_file:
+        header = read_current_header(snapshot_file, kind, source_filenames)
+        if header is None:
+            return None
+
+        columns = {}
+        try:
+            for name, column_kind, length in header["columns"]:
+                data = snapshot_file.read(length)
+                if len(data) != length:
+                    return None
+                columns[name] = column_from_bytes(column_kind, data)
+        except (TypeError, ValueError):
+            return None
+        return columns
@@ -1,4 +1,8 @@
-from app import App
+import argparse
+import datetime
+
+from app import App, run_archive, run_export, run_import
+from services.data_service import add_storage_arguments
 
 
 def main():
@@ -7,9 +11,62 @@ def main():
     -> register a patient to list of patients
     -> book an appointment for specified registered patient
     -> print patients and appointments in different ways (appointments per patient, per day, etc.)
+    -> import patients and appointments from CSV or JSON Lines files ('import' command)
+    -> export patients and appointments to CSV, JSON Lines or iCalendar files ('export' command)
+    -> move past appointments into compressed archives ('archive' command)
     """
 
-    App()
+    parser = argparse.ArgumentParser(description="Patient Register App for doctors.")
+    add_storage_arguments(parser)
+    commands = parser.add_subparsers(dest="command")
+    import_parser = commands.add_parser("import", help="import patients or appointments from CSV or JSON Lines file")
+    import_parser.add_argument("kind", choices=("patients", "appointments"), help="kind of imported records")
+    import_parser.add_argument("filename", help="imported file")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"), dest="file_format",
+                               help="format of the imported file, guessed from the file extension by default")
+    export_parser = commands.add_parser("export", help="export patients or appointments to CSV, JSON Lines "
+                                                       "or iCalendar file")
+    export_parser.add_argument("kind", choices=("patients", "appointments"), help="kind of exported records")
+    export_parser.add_argument("filename", help="exported file")
+    export_parser.add_argument("--format", choices=("csv", "jsonl", "ics"), dest="file_format",
+                               help="format of the exported file, guessed from the file extension by default")
+    export_parser.add_argument("--from", type=datetime.date.fromisoformat, dest="first_date",
+                               help="first day [YYYY-MM-DD] of exported appointments")
+    export_parser.add_argument("--to", type=datetime.date.fromisoformat, dest="last_date",
+                               help="last day [YYYY-MM-DD] of exported appointments")
+    archive_parser = commands.add_parser("archive", help="move appointments booked before the cutoff date "
+                                                         "into compressed per-year archives")
+    archive_parser.add_argument("before", type=datetime.date.fromisoformat,
+                                help="first day [YYYY-MM-DD] of appointments which are not archived")
+    archive_parser.add_argument("--compression", choices=("gzip", "lzma"), default="gzip",
+                                help="compression of the archives")
+    args = parser.parse_args()
+    if args.storage == "sharded" and args.persistence == "journal":
+        parser.error("the sharded storage does not support the journal persistence")
+
+    if args.command == "import":
+        try:
+            run_import(args.kind, args.filename, args.file_format, args.storage, args.persistence, args.durability)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        return
+
+    if args.command == "export":
+        try:
+            run_export(args.kind, args.filename, args.file_format, args.first_date, args.last_date,
+                       args.storage, args.persistence, args.durability)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        return
+
+    if args.command == "archive":
+        try:
+            run_archive(args.before, args.compression, args.storage, args.persistence, args.durability)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+        return
+
+    App(args.storage, args.persistence, args.durability)
 
 
 if __name__ == '__main__':
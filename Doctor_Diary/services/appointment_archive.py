@@ -0,0 +1,286 @@
+import bisect
+import gzip
+import json
+import lzma
+import os
+import re
+
+import services.model_entities as model_entities
+import helper_classes.json_service as json_service
+import helper_classes.snapshot as snapshot
+from services.json_storage import json_encoder, sync_directory
+from services.sharded_storage import save_json
+
+
+# Compression modules and file extensions of the archives.
+COMPRESSIONS = {"gzip": (gzip, ".jsonl.gz"), "lzma": (lzma, ".jsonl.xz")}
+ARCHIVE_FILENAME = re.compile(r"appointments-(\d{4})\.jsonl\.(gz|xz)$")
+
+
+def archive_module(filename):
+    """
+    Get compression module of the archive file from its extension.
+
+    Arguments:
+        filename (str): relative path for the archive file
+
+    Returns:
+        module (module): gzip or lzma
+    """
+
+    return lzma if filename.endswith(".xz") else gzip
+
+
+class AppointmentArchive:
+    """
+    A class that represents cold storage of past appointments moved out of the app data (see ModelManager
+    archive_appointments). Appointments of every year are kept in one compressed JSON Lines file
+    (archive/appointments-YYYY.jsonl.gz or .xz), sorted by date and time. Archives are only read
+    by patient queries, line by line with streaming decompression, so they are never loaded in memory.
+    A small patient index (archive/patient_years.json) lists years with archived appointments of every patient,
+    so a query reads only the archives of these years.
+
+    Attributes
+    ----------
+        directory: str
+            relative path for directory with archive files
+        compression: str
+            'gzip' or 'lzma' compression of newly written archives, existing ones are read with any of them
+        patient_years_filename: str
+            relative path for the patient index
+        patient_years: dict[str, int[]] | None
+            years with archived appointments keyed by patient number, None until the first use
+        patient_years_stamp: list | None
+            [size, mtime in ns] of the loaded patient index, it is loaded again when another process changes it
+    """
+
+    def __init__(self, directory, compression="gzip"):
+        """
+        Arguments:
+            directory (str): relative path for directory with archive files
+            compression (str): 'gzip' or 'lzma' compression of newly written archives
+        """
+
+        self.directory = directory
+        self.compression = compression
+        self.patient_years_filename = os.path.join(directory, "patient_years.json")
+        self.patient_years = None
+        self.patient_years_stamp = None
+
+    def archive_files(self):
+        """
+        Find archive files of all years.
+
+        Returns:
+            archive_files (dict[int, str]): relative paths for archive files keyed by year, sorted by year
+        """
+
+        if not os.path.isdir(self.directory):
+            return {}
+
+        archive_files = {}
+        for filename in sorted(os.listdir(self.directory)):
+            match = ARCHIVE_FILENAME.match(filename)
+            if match is None:
+                continue
+            year, path = int(match.group(1)), os.path.join(self.directory, filename)
+            # Archive left with another compression by an interrupted rewrite is older than the current one.
+            if year not in archive_files or path == self.archive_filename(year):
+                archive_files[year] = path
+        return dict(sorted(archive_files.items()))
+
+    def read_lines(self, filename):
+        """
+        Read appointment lines of the archive file with streaming decompression.
+
+        Arguments:
+            filename (str): relative path for the archive file
+
+        Returns:
+            lines (generator of str): JSON Lines of archived appointments
+        """
+
+        try:
+            with archive_module(filename).open(filename, "rt", encoding="utf8") as archive_file:
+                yield from archive_file
+        except (EOFError, lzma.LZMAError) as error:
+            # Truncated or damaged archive is reported like damaged json data.
+            raise ValueError(f"Damaged archive {filename}: {error}") from error
+
+    def read_appointments(self, filename):
+        """
+        Read all appointments of the archive file.
+
+        Arguments:
+            filename (str): relative path for the archive file
+
+        Returns:
+            appointments (generator of Appointment): archived appointments sorted by date and time
+        """
+
+        for line in self.read_lines(filename):
+            yield model_entities.Appointment(**json_service.appointment_deserializer(json.loads(line)))
+
+    def get_appointments_by_patient(self, number):
+        """
+        Get archived appointments of the patient. Only lines containing the patient number are decoded.
+
+        Arguments:
+            number (str): patient number
+
+        Returns:
+            patient_appointments (generator of Appointment): archived appointments sorted by date and time
+        """
+
+        quoted_number = json_encoder.encode(number)
+        archive_files = self.archive_files()
+        for year in self.patient_index().get(number, []):
+            if year not in archive_files:
+                continue
+            for line in self.read_lines(archive_files[year]):
+                if quoted_number not in line:
+                    continue
+                json_appointment = json.loads(line)
+                if json_appointment["patient_number"] == number:
+                    yield model_entities.Appointment(**json_service.appointment_deserializer(json_appointment))
+
+    def add_appointments(self, appointments):
+        """
+        Add appointments into archives of their years. Archives of the years are rewritten, appointments
+        already archived in the same time slot are replaced, so adding the same appointments again
+        (after a crash before they were deleted from the app data) does not duplicate them.
+
+        Arguments:
+            appointments (iterable of Appointment): archived appointments
+        """
+
+        appointments_by_year = {}
+        for appointment in appointments:
+            appointments_by_year.setdefault(appointment.date.year, []).append(appointment)
+        if not appointments_by_year:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        archive_files = self.archive_files()
+        # The index is written first, years listed without archived appointments of the patient are only read in vain.
+        patient_years = self.patient_index()
+        for year, year_appointments in appointments_by_year.items():
+            for appointment in year_appointments:
+                years = patient_years.setdefault(appointment.patient_number, [])
+                if year not in years:
+                    bisect.insort(years, year)
+        self.write_patient_index()
+
+        for year, year_appointments in appointments_by_year.items():
+            slots = {}
+            if year in archive_files:
+                for appointment in self.read_appointments(archive_files[year]):
+                    slots[(appointment.date, appointment.time)] = appointment
+            for appointment in year_appointments:
+                slots[(appointment.date, appointment.time)] = appointment
+            self.write_archive(year, (slots[slot] for slot in sorted(slots)), archive_files.get(year))
+        sync_directory(self.directory)
+
+    def delete_patient(self, number):
+        """
+        Set number in archived appointments of the deleted patient as 'patient_deleted', so a patient
+        registered later with the same number does not get them. Archives of the years listed
+        in the patient index are rewritten and the patient is removed from the index.
+
+        Arguments:
+            number (str): number of the deleted patient
+        """
+
+        years = self.patient_index().get(number)
+        if not years:
+            return
+
+        archive_files = self.archive_files()
+        for year in years:
+            if year not in archive_files:
+                continue
+            appointments = list(self.read_appointments(archive_files[year]))
+            for appointment in appointments:
+                if appointment.patient_number == number:
+                    appointment.patient_number = "patient_deleted"
+            self.write_archive(year, appointments, archive_files[year])
+        sync_directory(self.directory)
+        del self.patient_years[number]
+        self.write_patient_index()
+
+    def patient_index(self):
+        """
+        Get index of years with archived appointments of every patient. It is loaded on the first use
+        and again when another process changes it. Archives written before the index existed are read
+        once to build it.
+
+        Returns:
+            patient_years (dict[str, int[]]): years with archived appointments keyed by patient number
+        """
+
+        try:
+            stamp = snapshot.source_stamps([self.patient_years_filename])[0]
+        except FileNotFoundError:
+            stamp = None
+        if self.patient_years is not None and stamp == self.patient_years_stamp:
+            return self.patient_years
+
+        if stamp is not None:
+            with open(self.patient_years_filename, "rt", encoding="utf8") as index_file:
+                self.patient_years = json.load(index_file)
+            self.patient_years_stamp = stamp
+            return self.patient_years
+
+        self.patient_years = {}
+        for year, filename in self.archive_files().items():
+            for appointment in self.read_appointments(filename):
+                years = self.patient_years.setdefault(appointment.patient_number, [])
+                if year not in years:
+                    years.append(year)
+        if self.patient_years:
+            self.write_patient_index()
+        return self.patient_years
+
+    def write_patient_index(self):
+        """ Save the patient index, it replaces the index file when it is safely on disk. """
+
+        save_json(self.patient_years_filename, self.patient_years)
+        self.patient_years_stamp = snapshot.source_stamps([self.patient_years_filename])[0]
+
+    def archive_filename(self, year):
+        """
+        Get archive file of the year written with the current compression.
+
+        Arguments:
+            year (int): year of archived appointments
+
+        Returns:
+            filename (str): relative path for the archive file
+        """
+
+        return os.path.join(self.directory, f"appointments-{year:04d}{COMPRESSIONS[self.compression][1]}")
+
+    def write_archive(self, year, appointments, previous_filename=None):
+        """
+        Save appointments as the compressed archive of the year. They are written to a temporary file
+        which replaces the archive when it is safely on disk.
+
+        Arguments:
+            year (int): year of archived appointments
+            appointments (iterable of Appointment): all archived appointments of the year sorted by date and time
+            previous_filename (str | None): relative path for the replaced archive of the year, None if there is none
+        """
+
+        filename = self.archive_filename(year)
+        temporary_filename = filename + ".tmp"
+        with open(temporary_filename, "wb") as raw_file:
+            with COMPRESSIONS[self.compression][0].open(raw_file, "wt", encoding="utf8") as archive_file:
+                for appointment in appointments:
+                    archive_file.write(json_encoder.encode(appointment))
+                    archive_file.write("\n")
+            raw_file.flush()
+            os.fsync(raw_file.fileno())
+        os.replace(temporary_filename, filename)
+        # Archive written with another compression than the current one is replaced.
+        if previous_filename is not None and previous_filename != filename:
+            os.remove(previous_filename)
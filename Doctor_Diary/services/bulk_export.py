@@ -0,0 +1,183 @@
+import contextlib
+import csv
+import datetime
+import os
+
+import helper_classes.json_service as json_service
+import services.bulk_import as bulk_import
+import services.json_storage as json_storage
+
+
+FILE_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".ics": "ics"}
+FIELDS = {
+    "patients": ("number", "firstname", "lastname"),
+    "appointments": ("patient_number", "date", "time", "description", "duration"),
+}
+EXPORT_BUFFER_SIZE = 1 << 20
+ICS_LINE_LENGTH = 75
+
+
+def write_csv(export_file, kind, objects):
+    """
+    Write objects as CSV rows with a header line (the same fields as json files have).
+
+    Arguments:
+        export_file (file): text file opened with newline=''
+        kind (str): 'patients' or 'appointments'
+        objects (iterable of Patient | Appointment): exported objects
+
+    Returns:
+        count (int): number of exported objects
+    """
+
+    fields = FIELDS[kind]
+    writer = csv.writer(export_file)
+    writer.writerow(fields)
+    count = 0
+    for obj in objects:
+        record = json_service.json_serializer(obj)
+        writer.writerow([record[field] for field in fields])
+        count += 1
+    return count
+
+
+def write_jsonl(export_file, objects):
+    """
+    Write objects as JSON Lines, one json object per line.
+
+    Arguments:
+        export_file (file): text file opened with newline=''
+        objects (iterable of Patient | Appointment): exported objects
+
+    Returns:
+        count (int): number of exported objects
+    """
+
+    count = 0
+    for obj in objects:
+        export_file.write(json_storage.json_encoder.encode(obj))
+        export_file.write("\n")
+        count += 1
+    return count
+
+
+def ics_text(text):
+    """
+    Escape text value of iCalendar property.
+
+    Arguments:
+        text (str): property value
+
+    Returns:
+        text (str): escaped value
+    """
+
+    return text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\r\n", "\\n").replace("\n", "\\n")
+
+
+def ics_line(name, value):
+    """
+    Format iCalendar content line, lines longer than 75 octets are folded.
+
+    Arguments:
+        name (str): property name
+        value (str): escaped property value
+
+    Returns:
+        line (str): content line with CRLF line ending
+    """
+
+    line = f"{name}:{value}"
+    if len(line.encode("utf8")) <= ICS_LINE_LENGTH:
+        return line + "\r\n"
+
+    # Continuation lines start with a space, which counts into their length.
+    parts, part, size, limit = [], [], 0, ICS_LINE_LENGTH
+    for char in line:
+        char_size = len(char.encode("utf8"))
+        if size + char_size > limit:
+            parts.append("".join(part))
+            part, size, limit = [], 0, ICS_LINE_LENGTH - 1
+        part.append(char)
+        size += char_size
+    parts.append("".join(part))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def write_ics(export_file, appointments, get_patient):
+    """
+    Write appointments as iCalendar events. Times are exported as local (floating) times.
+
+    Arguments:
+        export_file (file): text file opened with newline=''
+        appointments (iterable of Appointment): exported appointments
+        get_patient (callable): function returning Patient (or None) for patient number, used for event summaries
+
+    Returns:
+        count (int): number of exported appointments
+    """
+
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    export_file.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Doctor Diary//EN\r\nCALSCALE:GREGORIAN\r\n")
+    count = 0
+    for appointment in appointments:
+        start = datetime.datetime.combine(appointment.date, appointment.time)
+        end = start + datetime.timedelta(minutes=appointment.duration)
+        patient = get_patient(appointment.patient_number)
+        if patient is None:
+            summary = f"Appointment: {appointment.patient_number}"
+        else:
+            summary = f"Appointment: {patient.firstname} {patient.lastname}"
+
+        export_file.write("BEGIN:VEVENT\r\n")
+        export_file.write(ics_line("UID", f"{start:%Y%m%dT%H%M%S}-{ics_text(appointment.patient_number)}@doctor-diary"))
+        export_file.write(ics_line("DTSTAMP", stamp))
+        export_file.write(ics_line("DTSTART", f"{start:%Y%m%dT%H%M%S}"))
+        export_file.write(ics_line("DTEND", f"{end:%Y%m%dT%H%M%S}"))
+        export_file.write(ics_line("SUMMARY", ics_text(summary)))
+        export_file.write(ics_line("DESCRIPTION", ics_text(appointment.description)))
+        export_file.write("END:VEVENT\r\n")
+        count += 1
+    export_file.write("END:VCALENDAR\r\n")
+    return count
+
+
+def export_file(kind, filename, file_format, objects, get_patient=None):
+    """
+    Export patients or appointments to CSV, JSON Lines or iCalendar (appointments only) file.
+    Objects are written one by one through a large write buffer, so they can be produced lazily
+    (e.g. by ModelManager.get_appointments_between) and the export uses constant memory.
+    The file is written to a temporary file which replaces the target file when it is complete.
+
+    Arguments:
+        kind (str): 'patients' or 'appointments'
+        filename (str): relative path for the exported file
+        file_format (str | None): 'csv', 'jsonl' or 'ics', None to guess it from the file extension
+        objects (iterable of Patient | Appointment): exported objects
+        get_patient (callable | None): function returning Patient for patient number, required by iCalendar
+
+    Returns:
+        count (int): number of exported objects
+    """
+
+    if file_format is None:
+        file_format = bulk_import.guess_file_format(filename, FILE_FORMATS)
+    if file_format == "ics" and kind != "appointments":
+        raise ValueError("Only appointments can be exported to iCalendar")
+
+    temporary_filename = filename + ".tmp"
+    try:
+        with open(temporary_filename, "wt", encoding="utf8", newline="", buffering=EXPORT_BUFFER_SIZE) as export:
+            if file_format == "csv":
+                count = write_csv(export, kind, objects)
+            elif file_format == "jsonl":
+                count = write_jsonl(export, objects)
+            else:
+                count = write_ics(export, objects, get_patient)
+    except BaseException:
+        # The temporary file does not exist if it could not be opened (e.g. missing directory).
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(temporary_filename)
+        raise
+    os.replace(temporary_filename, filename)
+    return count
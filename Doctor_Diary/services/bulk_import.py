@@ -0,0 +1,155 @@
+import csv
+import json
+import os
+
+import services.model_entities as model_entities
+import helper_classes.json_service as json_service
+from services.choice_controller import Validator
+
+
+FILE_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+
+
+def guess_file_format(filename, file_formats=FILE_FORMATS):
+    """
+    Get import (or export) file format from the file extension.
+
+    Arguments:
+        filename (str): relative path for the imported file
+        file_formats (dict[str, str]): formats keyed by file extension
+
+    Returns:
+        file_format (str): format of the file, e.g. 'csv' or 'jsonl'
+    """
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in file_formats:
+        raise ValueError(f"Unknown file format: {filename}")
+    return file_formats[extension]
+
+
+def read_records(filename, file_format):
+    """
+    Read import file record by record, so the file is never loaded as a whole.
+    CSV files need a header line with field names, JSON Lines files contain one object per line.
+
+    Arguments:
+        filename (str): relative path for the imported file
+        file_format (str): 'csv' or 'jsonl'
+
+    Returns:
+        records (generator of (int, dict | None)): line numbers with records,
+        None for lines which are not valid json objects
+    """
+
+    with open(filename, "rt", encoding="utf8", newline="") as import_file:
+        if file_format == "csv":
+            reader = csv.DictReader(import_file)
+            for record in reader:
+                yield reader.line_num, record
+            return
+
+        for line_number, line in enumerate(import_file, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = None
+            yield line_number, record if isinstance(record, dict) else None
+
+
+def patient_fields(record):
+    """
+    Validate patient record and get its fields.
+
+    Arguments:
+        record (dict): imported record with number, firstname and lastname (or first_name and last_name)
+
+    Returns:
+        fields (str, str, str): number, firstname and lastname of the patient
+    """
+
+    json_service.patient_deserializer(record)
+    number, firstname, lastname = str(record["number"]), str(record["firstname"]), str(record["lastname"])
+    Validator.number_validation(number)
+    Validator.name_validation(firstname)
+    Validator.name_validation(lastname)
+    return number, firstname, lastname
+
+
+def appointment_fields(record):
+    """
+    Validate appointment record and get its fields.
+
+    Arguments:
+        record (dict): imported record with patient_number, date, time, description and optional duration
+        (date and time can be named appointment_date and appointment_time)
+
+    Returns:
+        fields (str, date, time, str, int): patient number, date, time, description and duration of the appointment
+    """
+
+    json_service.rename_legacy_keys(record, json_service.LEGACY_APPOINTMENT_KEYS)
+    patient_number = str(record["patient_number"])
+    Validator.number_validation(patient_number)
+    date = json_service.parse_date(str(record["date"]))
+    # Fractions of a second are dropped, so every storage keeps the same time.
+    time = json_service.parse_time(str(record["time"]))
+    description = str(record.get("description") or "")
+    duration = record.get("duration")
+    # Missing (or empty CSV) duration means the default one, invalid durations reject the record.
+    duration = model_entities.DEFAULT_DURATION if duration in (None, "") else int(duration)
+    if not 1 <= duration <= model_entities.MAX_DURATION:
+        raise ValueError(f"Invalid duration: {duration}")
+    return patient_number, date, time, description, duration
+
+
+IMPORTS = {
+    "patients": (patient_fields, "add_patient", "PATIENT HAS BEEN ADDED"),
+    "appointments": (appointment_fields, "add_appointment", "APPOINTMENT HAS BEEN ADDED"),
+}
+
+
+def import_file(model_manager, kind, filename, file_format, report_error):
+    """
+    Import patients or appointments from CSV or JSON Lines file. Every record is validated
+    and added by ModelManager, so duplicates (registered patients, booked time slots) are
+    rejected by the same index lookups as in the app. Changes are not saved, the caller
+    finishes the whole import with a single ModelManager.save_changes().
+
+    Arguments:
+        model_manager (ModelManager): model of the app
+        kind (str): 'patients' or 'appointments'
+        filename (str): relative path for the imported file
+        file_format (str | None): 'csv' or 'jsonl', None to guess it from the file extension
+        report_error (callable): function called with line number and error message of every rejected record
+
+    Returns:
+        counts (int, int): numbers of imported and rejected records in a tuple
+    """
+
+    record_fields, add_method, added_status = IMPORTS[kind]
+    add = getattr(model_manager, add_method)
+    if file_format is None:
+        file_format = guess_file_format(filename)
+
+    imported, rejected = 0, 0
+    for line_number, record in read_records(filename, file_format):
+        if record is None:
+            status = "INVALID JSON OBJECT"
+        else:
+            try:
+                status = add(*record_fields(record))
+            except KeyError as error:
+                status = f"MISSING FIELD {error}"
+            except (TypeError, ValueError):
+                status = "INVALID DATA FORMAT"
+
+        if status == added_status:
+            imported += 1
+        else:
+            rejected += 1
+            report_error(line_number, status)
+
+    return imported, rejected
@@ -1,4 +1,4 @@
-from services.model_manager import ModelManager
+from services.model_manager import ModelManager, days_period
 from services.user_interface import UserInterface, Choice
 
 
@@ -39,7 +39,10 @@ class ChoiceController:
         if choice == Choice.EXIT:
             return False
 
-        elif choice == Choice.ADD_PATIENT:
+        # Other apps (e.g. on other terminals) could change the data while the user was choosing.
+        self.model_manager.refresh()
+
+        if choice == Choice.ADD_PATIENT:
             self.add_patient()
             return True
 
@@ -71,10 +74,29 @@ class ChoiceController:
             self.print_all_appointments()
             return True
 
+        elif choice == Choice.PRINT_PERIOD_APPOINTMENTS:
+            self.print_period_appointments()
+            return True
+
+        elif choice == Choice.FIND_FREE_SLOTS:
+            self.print_free_slots()
+            return True
+
+        elif choice == Choice.SEARCH_PATIENTS:
+            self.search_patients()
+            return True
+
+    def save_changes(self):
+        """ Save changes of the operation and print info about changes dropped because of conflicts with other apps. """
+
+        self.model_manager.save_changes()
+        for status in self.model_manager.take_conflicts():
+            self.user_interface.print_info(status)
+
     def add_patient(self):
         """
         Display interface for user, get user input data, validate them,
-        add new patient, write patients.json file and print operation status for user.
+        add new patient, save changes and print operation status for user.
         """
 
         # Input data validation was commented (easier for testing).
@@ -89,13 +111,13 @@ class ChoiceController:
             return
 
         status = self.model_manager.add_patient(number, firstname, lastname)
-        self.model_manager.write_patients()
+        self.save_changes()
         self.user_interface.print_info(status)
 
     def add_appointment(self):
         """
         Display interface for user, get user input data, add new appointment,
-        write appointments.json file and print operation status for user.
+        save changes and print operation status for user.
         """
 
         if self.model_manager.get_patients_count() == 0:
@@ -110,19 +132,40 @@ class ChoiceController:
         try:
             date = self.user_interface.get_date()
             time = self.user_interface.get_time()
+            duration = self.user_interface.get_appointment_duration()
             description = self.user_interface.get_appointment_description()
         except ValueError:
             self.user_interface.print_info("INVALID DATA FORMAT")
             return
 
-        status = self.model_manager.add_appointment(number, date, time, description)
-        self.model_manager.write_appointments()
+        status = self.model_manager.add_appointment(number, date, time, description, duration)
+        self.save_changes()
         self.user_interface.print_info(status)
 
-    def print_all_patients(self):
-        """ Print all registered patients. """
+    def print_all_patients(self, stop_text="BACK TO MENU"):
+        """
+        Print all registered patients sorted by number, page by page.
+
+        Arguments:
+            stop_text (str): what happens when the user stops the listing
+        """
+
+        cursor = None
+        while True:
+            patients, cursor = self.model_manager.get_patients_page(cursor, self.user_interface.page_size)
+            self.user_interface.print_patients(patients)
+            if cursor is None or not self.user_interface.next_page(stop_text):
+                return
+
+    def search_patients(self):
+        """ Display user interface, get searched names and print matching patients. """
+
+        text = self.user_interface.get_search_text()
+        patients = self.model_manager.search_patients(text)
+        if len(patients) == 0:
+            self.user_interface.print_info("NO MATCHING PATIENTS")
+            return
 
-        patients = self.model_manager.get_all_registered_patients()
         self.user_interface.print_patients(patients)
 
     def print_day_appointments(self):
@@ -140,6 +183,36 @@ class ChoiceController:
             self.user_interface.print_info("INVALID DATA FORMAT")
             return
 
+    def print_period_appointments(self):
+        """ Display user interface, get first and last date and print appointments between them. """
+
+        if self.model_manager.get_appointments_count() == 0:
+            self.user_interface.print_info("NO APPOINTMENTS BOOKED")
+            return
+
+        try:
+            first_date = self.user_interface.get_date("ENTER FIRST DATE")
+            last_date = self.user_interface.get_date("ENTER LAST DATE")
+        except ValueError:
+            self.user_interface.print_info("INVALID DATA FORMAT")
+            return
+
+        appointments = self.model_manager.get_appointments_between(*days_period(first_date, last_date))
+        self.user_interface.print_appointments(appointments)
+
+    def print_free_slots(self):
+        """ Display user interface, get search data and print first free time slots in working hours. """
+
+        try:
+            from_date = self.user_interface.get_date("ENTER FIRST DATE")
+            count, slot_length = self.user_interface.get_free_slots_query()
+            slots = self.model_manager.find_free_slots(from_date, count, slot_length)
+        except ValueError:
+            self.user_interface.print_info("INVALID DATA FORMAT")
+            return
+
+        self.user_interface.print_free_slots(slots)
+
     def print_patient_appointments(self):
         """ Display user interface, get input data and print appointments for specified patient """
 
@@ -159,27 +232,26 @@ class ChoiceController:
     def delete_patient(self):
         """
         Display interface for user, get user input data, validate them,
-        delete specified patient and print operation status for user.
+        delete specified patient, save changes and print operation status for user.
         """
 
         if self.model_manager.get_patients_count() == 0:
             self.user_interface.print_info("NO REGISTERED PATIENTS")
             return
 
-        patients = self.model_manager.get_all_registered_patients()
-        self.user_interface.print_patients(patients)
+        # Patients are listed page by page, the user can stop paging and enter the number.
+        self.print_all_patients("ENTER PATIENT NUMBER")
 
         number = self.user_interface.get_patient_number()
         # Validator.number_validation(number)
         status = self.model_manager.delete_patient(number)
+        self.save_changes()
         self.user_interface.print_info(status)
-        self.model_manager.write_patients()
-        self.model_manager.write_appointments()
 
     def delete_appointment(self):
         """
         Display interface for user, get user input data, delete specified appointment,
-        write appointments.json file and print operation status for user.
+        save changes and print operation status for user.
         """
 
         if self.model_manager.get_appointments_count() == 0:
@@ -194,13 +266,18 @@ class ChoiceController:
             return
 
         status = self.model_manager.delete_appointment(date, time)
-        self.model_manager.write_appointments()
+        self.save_changes()
         self.user_interface.print_info(status)
 
     def print_all_appointments(self):
-        """ Print all booked appointments """
-        appointments = self.model_manager.get_all_booked_appointments()
-        self.user_interface.print_appointments(appointments)
+        """ Print all booked appointments sorted by date and time, page by page. """
+
+        cursor = None
+        while True:
+            appointments, cursor = self.model_manager.get_appointments_page(cursor, self.user_interface.page_size)
+            self.user_interface.print_appointments(appointments)
+            if cursor is None or not self.user_interface.next_page():
+                return
 
 
 class Validator:
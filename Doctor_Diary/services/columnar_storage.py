@@ -0,0 +1,394 @@
+import bisect
+import json
+from array import array
+
+import services.model_entities as model_entities
+import helper_classes.json_service as json_service
+from services.json_storage import JsonStorage, date_from_ordinal, time_from_seconds, time_to_seconds
+
+
+DELETED = -1
+# Durations are stored as unsigned shorts.
+MAX_COLUMN_DURATION = 0xFFFF
+
+class AppointmentColumns:
+    """
+    A class that stores appointments in typed arrays (one array per attribute) instead of objects.
+    A row takes about 22 bytes plus its description, Appointment objects are created only on access.
+    Deleted rows are marked and removed by compaction, so row numbers of other appointments do not change.
+
+    Attributes
+    ----------
+        dates: array[int]
+            appointment dates as ordinals
+        times: array[int]
+            appointment times as seconds since midnight (the app keeps seconds of the time)
+        durations: array[int]
+            appointment lengths in minutes
+        patient_ids: array[int]
+            ids of interned patient numbers, -1 for deleted rows
+        description_offsets: array[int]
+            start offsets of descriptions in description_table, followed by the end offset
+        description_table: bytearray
+            utf8 encoded descriptions of all rows
+        patient_numbers: str[]
+            interned patient numbers, indexed by patient id
+        patient_ids_by_number: dict[str, int]
+            patient ids keyed by patient number
+        deleted_count: int
+            number of deleted rows waiting for compaction
+    """
+
+    def __init__(self):
+        self.dates = array("i")
+        self.times = array("i")
+        self.durations = array("H")
+        self.patient_ids = array("i")
+        self.description_offsets = array("q", [0])
+        self.description_table = bytearray()
+        self.patient_numbers = []
+        self.patient_ids_by_number = {}
+        self.deleted_count = 0
+
+    def __len__(self):
+        return len(self.patient_ids) - self.deleted_count
+
+    def __iter__(self):
+        for row in self.rows():
+            yield self.appointment(row)
+
+    def rows(self):
+        """
+        Get rows of booked (not deleted) appointments in booking order.
+
+        Returns:
+            rows (generator of int): row numbers
+        """
+
+        for row, patient_id in enumerate(self.patient_ids):
+            if patient_id != DELETED:
+                yield row
+
+    def patient_id(self, number):
+        """
+        Get id of the interned patient number, new numbers are interned.
+
+        Arguments:
+            number (str): patient number
+
+        Returns:
+            patient_id (int): id of the patient number
+        """
+
+        patient_id = self.patient_ids_by_number.get(number)
+        if patient_id is None:
+            patient_id = len(self.patient_numbers)
+            self.patient_numbers.append(number)
+            self.patient_ids_by_number[number] = patient_id
+        return patient_id
+
+    def append(self, patient_number, date_ordinal, seconds, description, duration):
+        """
+        Append appointment row.
+
+        Arguments:
+            patient_number (str): patient number
+            date_ordinal (int): appointment date as ordinal
+            seconds (int): appointment time as seconds since midnight
+            description (str): appointment description
+            duration (int): appointment length in minutes
+
+        Returns:
+            row (int): row number of the new appointment
+        """
+
+        # Values are checked before any column is changed, so a rejected row cannot leave columns of different length.
+        if not 0 <= duration <= MAX_COLUMN_DURATION:
+            raise ValueError(f"Appointment duration out of range: {duration}")
+        encoded_description = description.encode("utf8")
+        patient_id = self.patient_id(patient_number)
+
+        self.dates.append(date_ordinal)
+        self.times.append(seconds)
+        self.durations.append(duration)
+        self.patient_ids.append(patient_id)
+        self.description_table += encoded_description
+        self.description_offsets.append(len(self.description_table))
+        return len(self.patient_ids) - 1
+
+    def delete(self, row):
+        """
+        Mark row as deleted.
+
+        Arguments:
+            row (int): row number of the deleted appointment
+        """
+
+        self.patient_ids[row] = DELETED
+        self.deleted_count += 1
+
+    def description(self, row):
+        """
+        Decode description of the row.
+
+        Arguments:
+            row (int): row number
+
+        Returns:
+            description (str): appointment description
+        """
+
+        start, end = self.description_offsets[row], self.description_offsets[row + 1]
+        return self.description_table[start:end].decode("utf8")
+
+    def appointment(self, row):
+        """
+        Materialize the row as Appointment object. Changes of the object are not stored.
+
+        Arguments:
+            row (int): row number
+
+        Returns:
+            appointment (Appointment): appointment stored in the row
+        """
+
+        return model_entities.Appointment(self.patient_numbers[self.patient_ids[row]],
+                                          date_from_ordinal(self.dates[row]),
+                                          time_from_seconds(self.times[row]),
+                                          self.description(row),
+                                          self.durations[row])
+
+    def compacted(self):
+        """
+        Copy booked appointments into new columns without deleted rows.
+
+        Returns:
+            columns (AppointmentColumns): compacted copy of the columns
+        """
+
+        columns = AppointmentColumns()
+        for row in self.rows():
+            columns.append(self.patient_numbers[self.patient_ids[row]], self.dates[row], self.times[row],
+                           self.description(row), self.durations[row])
+        return columns
+
+    def copy(self):
+        """
+        Copy columns, the copy is not changed by later operations on the original.
+
+        Returns:
+            columns (AppointmentColumns): copy of the columns
+        """
+
+        columns = AppointmentColumns()
+        columns.dates = array("i", self.dates)
+        columns.times = array("i", self.times)
+        columns.durations = array("H", self.durations)
+        columns.patient_ids = array("i", self.patient_ids)
+        columns.description_offsets = array("q", self.description_offsets)
+        columns.description_table = bytearray(self.description_table)
+        columns.patient_numbers = list(self.patient_numbers)
+        columns.patient_ids_by_number = dict(self.patient_ids_by_number)
+        columns.deleted_count = self.deleted_count
+        return columns
+
+
+class ColumnarStorage(JsonStorage):
+    """
+    A json storage which keeps appointments in AppointmentColumns instead of Appointment objects.
+    Indexes hold row numbers in arrays, so ten years of appointments stay resident in a small footprint.
+    Files (json and journal) are the same as JsonStorage uses.
+
+    Attributes
+    ----------
+        appointments: AppointmentColumns
+            columns of booked appointments
+        appointments_by_date: dict[int, array[int]]
+            rows of booked appointments keyed by date ordinal, every day sorted by time
+        booked_dates: int[]
+            sorted keys of appointments_by_date
+        appointments_by_patient: dict[int, array[int]]
+            rows of booked appointments keyed by patient id, in booking order
+        compaction_threshold: int
+            minimal number of deleted rows which starts columns compaction
+    """
+
+    compaction_threshold = 4096
+
+    def read_appointments(self):
+        with open(self.appointments_filename, "rt", encoding="utf8") as appointments_file:
+            json_appointments = json.loads(appointments_file.read())
+
+        self.appointments = AppointmentColumns()
+        for json_appointment in json_appointments:
+            json_service.rename_legacy_keys(json_appointment, json_service.LEGACY_APPOINTMENT_KEYS)
+            self.appointments.append(json_appointment["patient_number"],
+                                     json_service.parse_date(json_appointment["date"]).toordinal(),
+                                     time_to_seconds(json_service.parse_time(json_appointment["time"])),
+                                     json_appointment["description"],
+                                     json_appointment.get("duration", model_entities.DEFAULT_DURATION))
+        del json_appointments
+        self.build_indexes()
+
+    def build_indexes(self):
+        """ Build date and patient indexes of appointment rows. """
+
+        columns = self.appointments
+        self.appointments_by_date = {}
+        self.appointments_by_patient = {}
+        for row in sorted(columns.rows(), key=columns.times.__getitem__):
+            self.appointments_by_date.setdefault(columns.dates[row], array("i")).append(row)
+        self.booked_dates = sorted(self.appointments_by_date)
+        for row in columns.rows():
+            self.appointments_by_patient.setdefault(columns.patient_ids[row], array("i")).append(row)
+
+    def appointments_snapshot(self):
+        return self.appointments.copy()
+
+    def appointment_columns(self):
+        columns = self.appointments
+        return {"appointment_dates": columns.dates, "appointment_times": columns.times,
+                "appointment_durations": columns.durations, "appointment_patient_ids": columns.patient_ids,
+                "appointment_description_offsets": columns.description_offsets,
+                "appointment_description_table": columns.description_table,
+                "appointment_patient_numbers": columns.patient_numbers}
+
+    def restore_appointments(self, snapshot_columns):
+        columns = AppointmentColumns()
+        columns.dates = snapshot_columns["appointment_dates"]
+        columns.times = snapshot_columns["appointment_times"]
+        columns.durations = snapshot_columns["appointment_durations"]
+        columns.patient_ids = snapshot_columns["appointment_patient_ids"]
+        columns.description_offsets = snapshot_columns["appointment_description_offsets"]
+        columns.description_table = bytearray(snapshot_columns["appointment_description_table"])
+        columns.patient_numbers = snapshot_columns["appointment_patient_numbers"]
+        columns.patient_ids_by_number = {number: patient_id
+                                         for patient_id, number in enumerate(columns.patient_numbers)}
+        columns.deleted_count = columns.patient_ids.count(DELETED)
+        self.appointments = columns
+        self.build_indexes()
+
+    def find_row(self, date, time):
+        """
+        Find row of the appointment booked in specified date, time.
+
+        Arguments:
+            date (date): appointment date
+            time (time): appointment time
+
+        Returns:
+            row (int | None): row number or None if the time slot is free
+        """
+
+        day_rows = self.appointments_by_date.get(date.toordinal())
+        if day_rows is None:
+            return None
+
+        seconds = time_to_seconds(time)
+        position = bisect.bisect_left(day_rows, seconds, key=self.appointments.times.__getitem__)
+        if position < len(day_rows) and self.appointments.times[day_rows[position]] == seconds:
+            return day_rows[position]
+        return None
+
+    def get_appointment(self, date, time):
+        row = self.find_row(date, time)
+        if row is None:
+            return None
+        return self.appointments.appointment(row)
+
+    def get_overlapping_appointment(self, date, start, end):
+        columns = self.appointments
+        day_rows = self.appointments_by_date.get(date.toordinal(), ())
+        position = bisect.bisect_left(day_rows, end, key=columns.times.__getitem__)
+        if position > 0:
+            row = day_rows[position - 1]
+            if columns.times[row] + columns.durations[row] * 60 > start:
+                return columns.appointment(row)
+        return None
+
+    def get_appointments_by_date(self, date):
+        day_rows = self.appointments_by_date.get(date.toordinal(), ())
+        return [self.appointments.appointment(row) for row in day_rows]
+
+    def get_appointments_between(self, start, end):
+        times = self.appointments.times.__getitem__
+        start_ordinal, end_ordinal = start.date().toordinal(), end.date().toordinal()
+        position = bisect.bisect_left(self.booked_dates, start_ordinal)
+        while position < len(self.booked_dates) and self.booked_dates[position] <= end_ordinal:
+            date_ordinal = self.booked_dates[position]
+            day_rows = self.appointments_by_date[date_ordinal]
+            low, high = 0, len(day_rows)
+            if date_ordinal == start_ordinal:
+                low = bisect.bisect_left(day_rows, time_to_seconds(start.time()), key=times)
+            if date_ordinal == end_ordinal:
+                high = bisect.bisect_left(day_rows, time_to_seconds(end.time()), key=times)
+            for row in day_rows[low:high]:
+                yield self.appointments.appointment(row)
+            position += 1
+
+    def get_appointments_by_patient(self, number):
+        patient_id = self.appointments.patient_ids_by_number.get(number)
+        patient_rows = self.appointments_by_patient.get(patient_id, ())
+        return [self.appointments.appointment(row) for row in patient_rows]
+
+    def add_appointment(self, appointment):
+        seconds = time_to_seconds(appointment.time)
+        row = self.appointments.append(appointment.patient_number, appointment.date.toordinal(), seconds,
+                                       appointment.description, appointment.duration)
+        if appointment.date.toordinal() not in self.appointments_by_date:
+            bisect.insort(self.booked_dates, appointment.date.toordinal())
+        day_rows = self.appointments_by_date.setdefault(appointment.date.toordinal(), array("i"))
+        day_rows.insert(bisect.bisect_right(day_rows, seconds, key=self.appointments.times.__getitem__), row)
+        self.appointments_by_patient.setdefault(self.appointments.patient_ids[row], array("i")).append(row)
+        self.appointments_changed = True
+        self.record_change("add_appointment", patient_number=appointment.patient_number, date=appointment.date,
+                           time=appointment.time, description=appointment.description,
+                           duration=appointment.duration)
+
+    def delete_appointment(self, appointment):
+        row = self.find_row(appointment.date, appointment.time)
+        date_ordinal = self.appointments.dates[row]
+        patient_id = self.appointments.patient_ids[row]
+
+        day_rows = self.appointments_by_date[date_ordinal]
+        day_rows.remove(row)
+        if not day_rows:
+            del self.appointments_by_date[date_ordinal]
+            del self.booked_dates[bisect.bisect_left(self.booked_dates, date_ordinal)]
+        patient_rows = self.appointments_by_patient[patient_id]
+        patient_rows.remove(row)
+        if not patient_rows:
+            del self.appointments_by_patient[patient_id]
+
+        self.appointments.delete(row)
+        if self.appointments.deleted_count >= max(self.compaction_threshold, len(self.appointments)):
+            self.appointments = self.appointments.compacted()
+            self.build_indexes()
+
+        self.appointments_changed = True
+        self.record_change("delete_appointment", date=appointment.date, time=appointment.time,
+                           patient_number=appointment.patient_number)
+
+    def release_appointments(self, number):
+        columns = self.appointments
+        patient_id = columns.patient_ids_by_number.get(number)
+        patient_rows = self.appointments_by_patient.pop(patient_id, array("i"))
+        deleted_id = columns.patient_id("patient_deleted")
+        for row in patient_rows:
+            columns.patient_ids[row] = deleted_id
+        self.appointments_by_patient.setdefault(deleted_id, array("i")).extend(patient_rows)
+        if patient_rows:
+            self.appointments_changed = True
+
+    def delete_appointments_before(self, date):
+        position = bisect.bisect_left(self.booked_dates, date.toordinal())
+        if position == 0:
+            return
+
+        for date_ordinal in self.booked_dates[:position]:
+            for row in self.appointments_by_date[date_ordinal]:
+                self.appointments.delete(row)
+        self.appointments = self.appointments.compacted()
+        self.build_indexes()
+        self.appointments_changed = True
+        self.record_change("delete_appointments_before", date=date)
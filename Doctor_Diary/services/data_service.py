@@ -0,0 +1,166 @@
+import json
+import os
+
+from services.appointment_archive import AppointmentArchive
+from services.columnar_storage import ColumnarStorage
+from services.json_storage import JsonStorage
+from services.model_manager import ModelManager
+from services.sharded_storage import ShardedStorage
+from services.sqlite_storage import SqliteStorage
+
+
+def create_storage(storage, persistence, data_dir="data"):
+    """
+    Create storage backend for the app data.
+
+    Arguments:
+        storage (str): 'json' for json files, 'columnar' for json files with compact in-memory appointments,
+        'sharded' for json files with appointments sharded by month, 'sqlite' for diary.sqlite3 database
+        persistence (str): 'full' or 'journal' mode of saving json files, 'sharded' storage supports 'full' only
+        data_dir (str): relative path for directory with data files
+
+    Returns:
+        storage (StorageBackend): storage of patients and appointments
+    """
+
+    patients_filename = os.path.join(data_dir, "patients.json")
+    appointments_filename = os.path.join(data_dir, "appointments.json")
+    if storage == "sqlite":
+        return SqliteStorage(os.path.join(data_dir, "diary.sqlite3"), patients_filename, appointments_filename)
+
+    journal_filename = os.path.join(data_dir, "journal.jsonl") if persistence == "journal" else None
+    snapshot_filename = os.path.join(data_dir, "diary.snapshot")
+    # Json files are shared with apps running on other terminals.
+    lock_filename = os.path.join(data_dir, "diary.lock")
+    if storage == "sharded":
+        return ShardedStorage(patients_filename, appointments_filename, os.path.join(data_dir, "appointments"),
+                              lock_filename=lock_filename)
+    if storage == "columnar":
+        return ColumnarStorage(patients_filename, appointments_filename, journal_filename,
+                               snapshot_filename=snapshot_filename, lock_filename=lock_filename)
+    return JsonStorage(patients_filename, appointments_filename, journal_filename,
+                       snapshot_filename=snapshot_filename, lock_filename=lock_filename)
+
+
+def add_storage_arguments(parser):
+    """
+    Add options choosing storage, persistence and durability of the app data, so the console app
+    and the GUI app can open the data directory the same way.
+
+    Arguments:
+        parser (ArgumentParser): command line parser of the app
+    """
+
+    parser.add_argument("--storage", choices=("json", "columnar", "sharded", "sqlite"), default="json",
+                        help="keep data in json files (optionally with columnar or month sharded appointments) "
+                             "or in SQLite database")
+    parser.add_argument("--persistence", choices=("full", "journal"), default="full",
+                        help="rewrite json files on every change or append changes to a journal")
+    parser.add_argument("--durability", choices=("operation", "coalesced", "exit"), default="operation",
+                        help="flush changes to disk after every operation, in groups or on exit")
+
+
+def create_archive(compression="gzip", data_dir="data"):
+    """
+    Create archive of past appointments moved out of the storage.
+
+    Arguments:
+        compression (str): 'gzip' or 'lzma' compression of newly written archives
+        data_dir (str): relative path for directory with data files
+
+    Returns:
+        archive (AppointmentArchive): compressed per-year archives in the archive directory
+    """
+
+    return AppointmentArchive(os.path.join(data_dir, "archive"), compression)
+
+
+def ensure_data_files(data_dir="data"):
+    """
+    Create data directory and empty json files, if they do not exist yet.
+
+    Arguments:
+        data_dir (str): relative path for directory with data files
+    """
+
+    os.makedirs(data_dir, exist_ok=True)
+    for filename in ("patients.json", "appointments.json"):
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            with open(path, "w") as json_file:
+                json.dump([], json_file)
+
+
+class DataService:
+    """
+    A class giving front ends (the GUI app) long-lived access to the app model,
+    so data files are loaded once (on the first use) and not on every read.
+    Data can be changed by another app (e.g. the console app) at the same time,
+    only the changes are loaded before every use of the model.
+
+    Attributes
+    ----------
+        storage: str
+            'json', 'columnar', 'sharded' or 'sqlite' storage of the app data
+        persistence: str
+            'full' or 'journal' mode of saving json files
+        durability: str
+            'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+        data_dir: str
+            relative path for directory with data files
+        model_manager: ModelManager | None
+            model of the app loaded from the data files, None until the first use
+    """
+
+    def __init__(self, storage="json", persistence="full", durability="operation", data_dir="data"):
+        """
+        Arguments:
+            storage (str): 'json', 'columnar', 'sharded' or 'sqlite' storage of the app data
+            persistence (str): 'full' or 'journal' mode of saving json files
+            durability (str): 'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+            data_dir (str): relative path for directory with data files
+        """
+
+        self.storage = storage
+        self.persistence = persistence
+        self.durability = durability
+        self.data_dir = data_dir
+        self.model_manager = None
+
+    def load(self):
+        """ Load the model from the data files. """
+
+        ensure_data_files(self.data_dir)
+        self.model_manager = ModelManager(create_storage(self.storage, self.persistence, self.data_dir),
+                                          self.durability, archive=create_archive(data_dir=self.data_dir))
+
+    def model(self):
+        """
+        Get the app model, it is loaded on the first use and changes made by other apps are loaded later.
+
+        Returns:
+            model_manager (ModelManager): up to date model of the app
+        """
+
+        if self.model_manager is None:
+            self.load()
+        else:
+            self.model_manager.refresh()
+        return self.model_manager
+
+    def save_changes(self):
+        """
+        Finish the operation made with the model returned by model().
+
+        Returns:
+            conflicts (str[]): info about changes dropped because they conflict with changes made by other apps
+        """
+
+        self.model_manager.save_changes()
+        return self.model_manager.take_conflicts()
+
+    def close(self):
+        """ Flush pending changes and close the storage. Call it before the app exits. """
+
+        if self.model_manager is not None:
+            self.model_manager.close()
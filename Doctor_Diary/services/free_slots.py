@@ -0,0 +1,150 @@
+import datetime
+import functools
+
+# Monday - Friday, 08:00 - 16:00
+WORKING_HOURS = {weekday: (datetime.time(8, 0), datetime.time(16, 0)) for weekday in range(5)}
+SEARCH_HORIZON_DAYS = 366
+
+
+def minute_of_day(time):
+    """
+    Get number of minutes since midnight (seconds are ignored).
+
+    Arguments:
+        time (time): time of the day
+
+    Returns:
+        minute (int): minutes since midnight
+    """
+
+    return time.hour * 60 + time.minute
+
+
+def booked_minutes(time, duration):
+    """
+    Get bitmap of minutes occupied by an appointment. Appointments starting within a minute
+    (e.g. at 10:00:30) occupy also the minute in which they end.
+
+    Arguments:
+        time (time): start of the appointment
+        duration (int): appointment length in minutes
+
+    Returns:
+        minutes (int): bitmap with bits set from the start minute to the minute when the appointment ends
+    """
+
+    minutes = duration + (1 if time.second or time.microsecond else 0)
+    return ((1 << minutes) - 1) << minute_of_day(time)
+
+
+def occupancy_bitmap(intervals):
+    """
+    Build day occupancy bitmap, bit number N is set if minute N of the day is booked.
+
+    Arguments:
+        intervals (iterable of (time, int)): starts and durations (in minutes) of booked appointments
+
+    Returns:
+        occupancy (int): occupancy bitmap of the day
+    """
+
+    occupancy = 0
+    for time, duration in intervals:
+        occupancy |= booked_minutes(time, duration)
+    return occupancy
+
+
+@functools.lru_cache(maxsize=256)
+def slot_grid(first_minute, last_minute, slot_length):
+    """
+    Get bitmap of slot starts in working hours (slots are aligned to the start of working hours).
+
+    Arguments:
+        first_minute (int): first working minute of the day
+        last_minute (int): minute when the work ends
+        slot_length (int): slot length in minutes
+
+    Returns:
+        grid (int): bitmap with bits set at slot starts
+    """
+
+    grid = 0
+    for minute in range(first_minute, last_minute - slot_length + 1, slot_length):
+        grid |= 1 << minute
+    return grid
+
+
+def free_runs(free, length):
+    """
+    Find runs of free minutes. Runs are doubled in every step, so it takes log(length) operations.
+
+    Arguments:
+        free (int): bitmap of free minutes
+        length (int): required number of consecutive free minutes
+
+    Returns:
+        runs (int): bitmap with bit N set if minutes N .. N + length - 1 are all free
+    """
+
+    runs, covered = free, 1
+    while covered < length:
+        step = min(covered, length - covered)
+        runs &= runs >> step
+        covered += step
+    return runs
+
+
+def find_free_slots(day_occupancy, from_date, count, slot_length, working_hours=None, holidays=()):
+    """
+    Scan days forward and find first free slots in working hours.
+
+    Arguments:
+        day_occupancy (callable): function returning occupancy bitmap for a date
+        from_date (date | datetime): first day of the search, slots before datetime time are skipped
+        count (int): number of searched slots
+        slot_length (int): slot length in minutes
+        working_hours (dict[int, (time, time)] | None): working hours keyed by weekday (Monday is 0),
+        days missing in the dict are free days, None for Monday - Friday 08:00 - 16:00
+        holidays (iterable of date): free days
+
+    Returns:
+        slots (datetime[]): starts of free slots (at most count slots in SEARCH_HORIZON_DAYS days)
+    """
+
+    if slot_length < 1:
+        raise ValueError("Slot length has to be positive")
+    if working_hours is None:
+        working_hours = WORKING_HOURS
+    holidays = set(holidays)
+
+    not_before = 0
+    if isinstance(from_date, datetime.datetime):
+        not_before = from_date.hour * 60 + from_date.minute + (from_date.second > 0)
+        from_date = from_date.date()
+
+    slots = []
+    for day_offset in range(SEARCH_HORIZON_DAYS):
+        date = from_date + datetime.timedelta(days=day_offset)
+        hours = working_hours.get(date.weekday())
+        if hours is None or date in holidays:
+            continue
+
+        first_minute, last_minute = minute_of_day(hours[0]), minute_of_day(hours[1])
+        if day_offset == 0:
+            first_working_minute = max(first_minute, not_before)
+        else:
+            first_working_minute = first_minute
+        working = (1 << last_minute) - (1 << first_working_minute) if first_working_minute < last_minute else 0
+        free = working & ~day_occupancy(date)
+        starts = free_runs(free, slot_length) & slot_grid(first_minute, last_minute, slot_length)
+
+        while starts and len(slots) < count:
+            lowest = starts & -starts
+            minute = lowest.bit_length() - 1
+            slots.append(datetime.datetime.combine(date, datetime.time(minute // 60, minute % 60)))
+            starts ^= lowest
+
+        if len(slots) == count:
+            break
+
+    return slots
@@ -0,0 +1,912 @@
+import bisect
+import contextlib
+import datetime
+import functools
+import gc
+import itertools
+import json
+import operator
+import os
+import threading
+from array import array
+
+import services.model_entities as model_entities
+import helper_classes.json_service as json_service
+import helper_classes.journal as journal
+import helper_classes.snapshot as snapshot
+from helper_classes.file_lock import FileLock
+from services.storage_backend import StorageBackend
+
+
+def load_patients(filename):
+    """
+    Load registered patients from json file and convert them into Patient objects.
+
+    Arguments:
+        filename (str): relative path for patients.json file
+
+    Returns:
+        patients (Patient[]): list of registered patients
+    """
+
+    with open(filename, "rt", encoding="utf8") as patients_file:
+        json_patients = json.loads(patients_file.read())
+
+    patients = []
+    for json_patient in json_patients:
+        object_patient = model_entities.Patient(**json_service.patient_deserializer(json_patient))
+        patients.append(object_patient)
+
+    return patients
+
+
+def load_appointments(filename):
+    """
+    Load booked appointments from json file and convert them into Appointment objects.
+
+    Arguments:
+        filename (str): relative path for appointments.json file
+
+    Returns:
+        appointments (Appointment[]): list of booked appointments
+    """
+
+    with open(filename, "rt", encoding="utf8") as appointments_file:
+        json_appointments = json.loads(appointments_file.read())
+
+    appointments = []
+    for json_appointment in json_appointments:
+        json_service.appointment_deserializer(json_appointment)
+        object_appointment = model_entities.Appointment(**json_appointment)
+        appointments.append(object_appointment)
+
+    return appointments
+
+
+json_encoder = json.JSONEncoder(default=json_service.json_serializer)
+
+
+def object_json(obj):
+    """
+    Serialize model object as an item of json array, with the same layout as json.dump(objects, indent=4)
+    produces. Indented json.dump falls back to the pure Python encoder, field values are encoded
+    by the C encoder instead, which makes writing big files several times faster.
+
+    Arguments:
+        obj (Patient | Appointment): serialized object
+
+    Returns:
+        text (str): indented json object
+    """
+
+    fields = json_service.json_serializer(obj)
+    return "{\n        " + ",\n        ".join(f'"{name}": {json_encoder.encode(value)}'
+                                          for name, value in fields.items()) + "\n    }"
+
+
+def write_json(filename, objects):
+    """
+    Save model objects (patients or appointments) as json array file.
+    Objects are written to a temporary file which replaces the target file when it is
+    safely on disk, so a crash in the middle of writing never leaves a truncated file.
+
+    Arguments:
+        filename (str): relative path for json file
+        objects (iterable of Patient | Appointment): saved objects
+    """
+
+    os.replace(write_json_temporary(filename, objects), filename)
+    sync_directory(os.path.dirname(filename))
+
+
+def write_json_temporary(filename, objects):
+    """
+    Save model objects (patients or appointments) as json array into a temporary file next to the target file.
+    Objects are serialized one by one, so they can be produced lazily by a generator.
+
+    Arguments:
+        filename (str): relative path for json file which is replaced by the temporary file later
+        objects (iterable of Patient | Appointment): saved objects
+
+    Returns:
+        temporary_filename (str): relative path for the temporary file safely written on disk
+    """
+
+    temporary_filename = filename + ".tmp"
+    with open(temporary_filename, "wt", encoding="utf8") as json_file:
+        # The same layout as json.dump(objects, indent=4) produces.
+        separator = "[\n    "
+        for obj in objects:
+            json_file.write(separator)
+            json_file.write(object_json(obj))
+            separator = ",\n    "
+        json_file.write("[]" if separator == "[\n    " else "\n]")
+        json_file.flush()
+        os.fsync(json_file.fileno())
+    return temporary_filename
+
+
+def sync_directory(directory):
+    """
+    Force directory entries (e.g. renamed files) to disk. It does nothing on systems
+    which cannot open directories (Windows).
+
+    Arguments:
+        directory (str): relative path for directory
+    """
+
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+
+    directory_descriptor = os.open(directory or ".", os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(directory_descriptor)
+    finally:
+        os.close(directory_descriptor)
+
+
+def time_to_seconds(time):
+    """
+    Convert time into number of seconds since midnight.
+
+    Arguments:
+        time (time): time of the day
+
+    Returns:
+        seconds (int): seconds since midnight
+    """
+
+    return time.hour * 3600 + time.minute * 60 + time.second
+
+
+def appointment_seconds(appointment):
+    """
+    Get start of the appointment in seconds since midnight.
+
+    Arguments:
+        appointment (Appointment): booked appointment
+
+    Returns:
+        seconds (int): seconds since midnight
+    """
+
+    return time_to_seconds(appointment.time)
+
+
+date_from_ordinal = functools.lru_cache(maxsize=None)(datetime.date.fromordinal)
+
+
+@functools.lru_cache(maxsize=None)
+def time_from_seconds(seconds):
+    """
+    Convert number of seconds since midnight into time. Results are cached,
+    so materialized appointments share date and time objects.
+
+    Arguments:
+        seconds (int): seconds since midnight
+
+    Returns:
+        time (time): time of the day
+    """
+
+    return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+appointment_time = operator.attrgetter("time")
+appointment_fields = operator.attrgetter(*model_entities.Appointment.__slots__)
+
+# Parts of the data (json files) changed by the journal operations.
+CHANGED_PARTS = {
+    "add_patient": ("patients",),
+    "delete_patient": ("patients", "appointments"),
+    "add_appointment": ("appointments",),
+    "delete_appointment": ("appointments",),
+    "delete_appointments_before": ("appointments",),
+}
+
+
+class JsonStorage(StorageBackend):
+    """
+    A storage keeping all patients and appointments in memory with hash indexes
+    and saving them as json files (optionally with an append-only journal).
+
+    The files can be shared by several processes (apps on other terminals). Changing operations
+    and flushes hold the data lock, whose file also stores versions of the json files and the journal.
+    A process which finds other versions than it has loaded reads again only the changed json file
+    and replays its changes which are not flushed yet (pending records) on top of it, so no update
+    is lost. With the journal, records appended by other processes are read from the journal end.
+    Json files replaced by hand (or by other tools) are found by their size and modification time
+    and loaded again the same way.
+
+    Attributes
+    ----------
+        patients_filename: str
+            relative path for patients.json file
+        appointments_filename: str
+            relative path for appointments.json file
+        patients: Patient[]
+            list of registered patients
+        appointments: Appointment[]
+            list of booked appointments
+        patients_by_number: dict[str, Patient]
+            index of registered patients keyed by patient number
+        patient_numbers: str[]
+            sorted numbers of registered patients (pages of patients)
+        appointments_by_date: dict[date, Appointment[]]
+            index of booked appointments keyed by date, every day list sorted by time
+        booked_dates: date[]
+            sorted keys of appointments_by_date
+        appointments_by_patient: dict[str, Appointment[]]
+            index of booked appointments keyed by patient number
+        patients_changed: bool
+            True if patients were changed since the last flush
+        appointments_changed: bool
+            True if appointments were changed since the last flush
+        journal: Journal | None
+            append-only log of changes, None if every flush rewrites json files
+        journal_threshold: int
+            number of journal records which starts compaction into json files
+        compaction: Thread | None
+            background thread writing compacted journal into json files
+        snapshot_filename: str | None
+            relative path for binary snapshot of entities and indexes, None to load json files only
+        journal_filename: str | None
+            relative path for journal file, None to rewrite json files on every flush
+        data_lock: FileLock | None
+            lock of the data files shared with other processes, None if they are used by this process only
+        compaction_lock: FileLock | None
+            lock held by the process compacting the shared journal, None without the journal or data lock
+        versions: dict[str, int]
+            versions of patients, appointments json files and of the journal loaded by this storage
+        pending_records: list[dict] | None
+            records of changes which are not flushed yet, replayed after loading changes of other processes,
+            None if the journal is used
+        stamps: dict[str, list | None]
+            [size, mtime in ns] of patients and appointments json files loaded or written by this storage
+        conflicts: list[dict]
+            records of changes dropped because they conflict with changes made by other processes
+    """
+
+    def __init__(self, patients_filename, appointments_filename, journal_filename=None, journal_threshold=1000,
+                 snapshot_filename=None, lock_filename=None):
+        """
+        Arguments:
+            patients_filename (str): relative path for patients.json file
+            appointments_filename (str): relative path for appointments.json file
+            journal_filename (str | None): relative path for journal file, None to rewrite json files on every flush
+            journal_threshold (int): number of journal records which starts compaction into json files
+            snapshot_filename (str | None): relative path for binary snapshot written when the storage is closed
+            lock_filename (str | None): relative path for lock file of the data files shared with other processes,
+            None if the files are used by this process only
+        """
+
+        self.patients_filename = patients_filename
+        self.appointments_filename = appointments_filename
+        self.journal_filename = journal_filename
+        self.journal_threshold = journal_threshold
+        self.snapshot_filename = snapshot_filename
+        self.journal = None
+        self.compaction = None
+        self.data_lock = None
+        self.compaction_lock = None
+        if lock_filename is not None:
+            self.data_lock = FileLock(lock_filename)
+            if journal_filename is not None:
+                self.compaction_lock = FileLock(journal_filename + ".lock")
+        self.pending_records = [] if journal_filename is None else None
+        self.conflicts = []
+        with self.locked():
+            self.load()
+
+    def load(self):
+        """
+        Load registered patients and booked appointments from the snapshot if it is up to date
+        or from json files otherwise. If journal file is specified, changes written to the journal
+        are replayed on top of them. Called with the data lock held.
+        """
+
+        columns = None
+        if self.snapshot_filename is not None:
+            columns = snapshot.read_snapshot(self.snapshot_filename, type(self).__name__, self.json_filenames())
+
+        if columns is None:
+            self.read_patients()
+            self.read_appointments()
+        else:
+            # Restored entities do not have reference cycles, collecting them only slows the loading down.
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                self.restore_snapshot(columns)
+            finally:
+                if gc_enabled:
+                    gc.enable()
+
+        self.patients_changed = False
+        self.appointments_changed = False
+        self.versions = self.read_versions()
+        self.stamps = self.read_stamps()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.journal_filename is not None:
+            model_journal = journal.Journal(self.journal_filename)
+            for record in itertools.chain(journal.read_records(model_journal.compacting_filename),
+                                          model_journal.read_new_records()):
+                self.apply_record(record)
+                model_journal.records_count += 1
+            self.journal = model_journal
+
+    def locked(self):
+        return self.data_lock if self.data_lock is not None else contextlib.nullcontext()
+
+    def read_versions(self):
+        """
+        Read versions of the data files stored in the lock file. Called with the data lock held.
+
+        Returns:
+            versions (dict[str, int]): versions of patients, appointments json files and of the journal
+        """
+
+        versions = self.data_lock.read_data() if self.data_lock is not None else {}
+        return {name: versions.get(name, 0) for name in ("patients", "appointments", "journal")}
+
+    def write_versions(self, names):
+        """
+        Increase versions of the data files rewritten by this process, so other processes load them again.
+        Called with the data lock held.
+
+        Arguments:
+            names (str[]): 'patients', 'appointments' or 'journal'
+        """
+
+        if self.data_lock is None or not names:
+            return
+
+        versions = self.read_versions()
+        for name in names:
+            versions[name] += 1
+        self.data_lock.write_data(versions)
+        self.versions = versions
+
+    def read_stamps(self):
+        """
+        Read size and modification time of the json files.
+
+        Returns:
+            stamps (dict[str, list | None]): [size, mtime in ns] of patients and appointments json files,
+            None for a missing file
+        """
+
+        stamps = {}
+        for name, filename in zip(("patients", "appointments"), self.json_filenames()):
+            try:
+                stamps[name] = snapshot.source_stamps([filename])[0]
+            except FileNotFoundError:
+                stamps[name] = None
+        return stamps
+
+    def refresh(self):
+        with self.locked():
+            versions = self.read_versions()
+            # Files edited without the app do not change the versions.
+            stamps = self.read_stamps()
+            edited = {name for name in stamps if stamps[name] != self.stamps[name]}
+            if versions == self.versions and not edited:
+                return self.read_journal_records() if self.journal is not None else set()
+
+            if self.journal is not None:
+                # The journal was compacted by another process, its records are in json files now.
+                self.load()
+                return {"patients", "appointments"}
+
+            changed = {name for name in ("patients", "appointments") if versions[name] != self.versions[name]}
+            changed |= edited
+            self.load_changes(changed)
+            self.versions = versions
+            self.stamps = stamps
+            return changed
+
+    def load_changes(self, changed):
+        """
+        Load json files changed by other processes and replay changes of this process which are not flushed yet
+        on top of them. Changes which conflict with changes of other processes are dropped and kept in conflicts.
+
+        Arguments:
+            changed (set[str]): 'patients' and/or 'appointments', parts of the data changed by other processes
+        """
+
+        records, self.pending_records = self.pending_records, None
+        if "patients" in changed:
+            self.read_patients()
+            self.patients_changed = False
+        if "appointments" in changed:
+            self.read_appointments()
+            self.appointments_changed = False
+
+        kept = []
+        for record in records:
+            # Records changing only parts which were not loaded again are already applied.
+            if changed.isdisjoint(CHANGED_PARTS[record["operation"]]) or self.apply_record(dict(record)):
+                kept.append(record)
+            else:
+                self.conflicts.append(record)
+        self.pending_records = kept
+
+    def read_journal_records(self):
+        """
+        Apply records appended to the journal by other processes.
+
+        Returns:
+            changed (set[str]): 'patients' and/or 'appointments', parts of the data changed by the records
+        """
+
+        model_journal, self.journal = self.journal, None
+        changed = set()
+        try:
+            for record in model_journal.read_new_records():
+                changed.update(CHANGED_PARTS.get(record["operation"], ()))
+                self.apply_record(record)
+                model_journal.records_count += 1
+        finally:
+            self.journal = model_journal
+        return changed
+
+    def take_conflicts(self):
+        conflicts, self.conflicts = self.conflicts, []
+        return conflicts
+
+    def json_filenames(self):
+        """
+        Get json files which are the source of the snapshot.
+
+        Returns:
+            filenames (tuple[str]): relative paths for patients and appointments json files
+        """
+
+        return self.patients_filename, self.appointments_filename
+
+    def write_snapshot(self):
+        """ Save entities as binary snapshot columns, unless the snapshot is already up to date. """
+
+        kind = type(self).__name__
+        if snapshot.snapshot_is_current(self.snapshot_filename, kind, self.json_filenames()):
+            return
+
+        snapshot.write_snapshot(self.snapshot_filename, kind, self.json_filenames(), self.snapshot_columns())
+
+    def snapshot_columns(self):
+        """
+        Get registered patients and booked appointments as columns of primitive values saved in the snapshot.
+
+        Returns:
+            columns (dict[str, array | list]): snapshot columns keyed by name
+        """
+
+        columns = {"patient_numbers": [patient.number for patient in self.patients],
+                   "patient_firstnames": [patient.firstname for patient in self.patients],
+                   "patient_lastnames": [patient.lastname for patient in self.patients]}
+        columns.update(self.appointment_columns())
+        return columns
+
+    def appointment_columns(self):
+        """
+        Get booked appointments as snapshot columns.
+
+        Returns:
+            columns (dict[str, array | list]): snapshot columns keyed by name
+        """
+
+        appointments = self.appointments
+        return {"appointment_patient_numbers": [appointment.patient_number for appointment in appointments],
+                "appointment_dates": array("i", [appointment.date.toordinal() for appointment in appointments]),
+                "appointment_times": array("i", [appointment_seconds(appointment) for appointment in appointments]),
+                "appointment_descriptions": [appointment.description for appointment in appointments],
+                "appointment_durations": array("i", [appointment.duration for appointment in appointments])}
+
+    def restore_snapshot(self, columns):
+        """
+        Rebuild registered patients, booked appointments and their indexes from snapshot columns.
+
+        Arguments:
+            columns (dict[str, array | bytes | list]): snapshot columns keyed by name
+        """
+
+        self.set_patients(list(map(model_entities.Patient, columns["patient_numbers"],
+                                   columns["patient_firstnames"], columns["patient_lastnames"])))
+        self.restore_appointments(columns)
+
+    def restore_appointments(self, columns):
+        """
+        Rebuild booked appointments and their indexes from snapshot columns.
+
+        Arguments:
+            columns (dict[str, array | bytes | list]): snapshot columns keyed by name
+        """
+
+        self.set_appointments(list(map(model_entities.Appointment, columns["appointment_patient_numbers"],
+                                       map(date_from_ordinal, columns["appointment_dates"]),
+                                       map(time_from_seconds, columns["appointment_times"]),
+                                       columns["appointment_descriptions"], columns["appointment_durations"])))
+
+    def read_patients(self):
+        """ Load registered patients from json file and build patient indexes. """
+
+        self.set_patients(load_patients(self.patients_filename))
+
+    def set_patients(self, patients):
+        """
+        Replace registered patients and build patient indexes.
+
+        Arguments:
+            patients (Patient[]): list of registered patients
+        """
+
+        self.patients = patients
+        self.patients_by_number = {patient.number: patient for patient in self.patients}
+        self.patient_numbers = sorted(self.patients_by_number)
+
+    def read_appointments(self):
+        """ Load booked appointments from json file and build appointment indexes. """
+
+        self.set_appointments(load_appointments(self.appointments_filename))
+
+    def set_appointments(self, appointments):
+        """
+        Replace booked appointments and build appointment indexes.
+
+        Arguments:
+            appointments (Appointment[]): list of booked appointments
+        """
+
+        self.appointments = appointments
+        self.appointments_by_date = {}
+        self.appointments_by_patient = {}
+        for appointment in sorted(self.appointments, key=appointment_time):
+            self.appointments_by_date.setdefault(appointment.date, []).append(appointment)
+        self.booked_dates = sorted(self.appointments_by_date)
+        for appointment in self.appointments:
+            self.appointments_by_patient.setdefault(appointment.patient_number, []).append(appointment)
+
+    def appointments_snapshot(self):
+        """
+        Get a copy of booked appointments which is not changed by later operations.
+
+        Returns:
+            appointments (iterable of Appointment): copy of booked appointments
+        """
+
+        return list(self.appointments)
+
+    def write_patients(self):
+        """ Save Patients list as json file"""
+
+        self.patients_changed = False
+        try:
+            write_json(self.patients_filename, list(self.patients))
+        except OSError:
+            self.patients_changed = True
+            raise
+
+    def write_appointments(self):
+        """ Save Appointments list as json file."""
+
+        self.appointments_changed = False
+        try:
+            write_json(self.appointments_filename, self.appointments_snapshot())
+        except OSError:
+            self.appointments_changed = True
+            raise
+
+    def flush(self):
+        """
+        Write changes made since the last flush to disk and increase versions of the rewritten json files.
+        With the journal enabled changes are already appended to it, so json files
+        are rewritten only by compaction once the journal grows over its threshold.
+        """
+
+        if self.journal is None:
+            written = []
+            try:
+                if self.patients_changed:
+                    self.write_patients()
+                    written.append("patients")
+                if self.appointments_changed:
+                    self.write_appointments()
+                    written.append("appointments")
+            finally:
+                self.write_versions(written)
+                if written:
+                    self.stamps = self.read_stamps()
+            self.pending_records = []
+            return
+
+        self.journal.sync()
+        if self.journal.records_count >= self.journal_threshold:
+            self.compact_journal()
+
+    def record_change(self, operation, **arguments):
+        """
+        Append changing operation to the journal (if enabled) or to pending records (if the files are shared).
+
+        Arguments:
+            operation (str): name of the changing operation
+            arguments (dict): arguments of the changing operation
+        """
+
+        if self.journal is not None:
+            self.journal.append(operation, **arguments)
+        elif self.pending_records is not None:
+            self.pending_records.append({"operation": operation, **arguments})
+
+    def apply_record(self, record):
+        """
+        Repeat operation stored in the journal (or pending) record. Operations which are already
+        included in the data (json files after interrupted compaction) are skipped.
+
+        Arguments:
+            record (dict): journal record with operation name and its arguments
+
+        Returns:
+            applied (bool): False if the operation conflicts with the data, e.g. its patient number
+            is registered with another name or its time slot is booked by another appointment
+        """
+
+        operation = record.pop("operation")
+        if operation == "add_patient":
+            patient = self.get_patient(record["number"])
+            if patient is not None:
+                return (patient.firstname, patient.lastname) == (record["firstname"], record["lastname"])
+            self.add_patient(model_entities.Patient(**record))
+        elif operation == "delete_patient":
+            if self.get_patient(record["number"]) is not None:
+                self.delete_patient(record["number"])
+            else:
+                # Appointments loaded again can still have the number of the patient deleted before.
+                self.release_appointments(record["number"])
+        elif operation == "add_appointment":
+            appointment = model_entities.Appointment(**record)
+            start = time_to_seconds(appointment.time)
+            busy = self.get_overlapping_appointment(appointment.date, start, start + appointment.duration * 60)
+            if busy is not None:
+                return appointment_fields(busy) == appointment_fields(appointment)
+            self.add_appointment(appointment)
+        elif operation == "delete_appointment":
+            appointment = self.get_appointment(record["date"], record["time"])
+            if appointment is not None:
+                # Time slot can be booked again for another patient by another process.
+                if appointment.patient_number not in (record.get("patient_number", appointment.patient_number),
+                                                      "patient_deleted"):
+                    return False
+                self.delete_appointment(appointment)
+        elif operation == "delete_appointments_before":
+            self.delete_appointments_before(record["date"])
+        else:
+            raise ValueError(f"Unknown journal operation: {operation}")
+        return True
+
+    def compact_journal(self, wait=False):
+        """
+        Write current patients and appointments to json files in a background thread
+        and drop journal records which are already included in them.
+        It is skipped if previous compaction (of this or another process) is still running.
+
+        Arguments:
+            wait (bool): block until the compaction is finished
+        """
+
+        if self.compaction is not None and self.compaction.is_alive():
+            return
+
+        if self.compaction_lock is not None and not self.compaction_lock.acquire(blocking=False):
+            return
+
+        try:
+            with self.locked():
+                # Records appended by other processes since the last refresh have to be in the compacted data.
+                self.refresh()
+                self.journal.rotate()
+                # Other processes write to the rotated journal file, they have to open the new one.
+                self.write_versions(["journal"])
+                self.compaction = threading.Thread(target=self.write_compacted,
+                                                   args=(list(self.patients), self.appointments_snapshot()))
+        except BaseException:
+            if self.compaction_lock is not None:
+                self.compaction_lock.release()
+            raise
+
+        self.compaction.start()
+        if wait:
+            self.compaction.join()
+
+    def write_compacted(self, patients, appointments):
+        """
+        Save copies of patients and appointments lists as json files and finish journal compaction.
+
+        Arguments:
+            patients (Patient[]): copy of registered patients list
+            appointments (iterable of Appointment): copy of booked appointments
+        """
+
+        try:
+            patients_filename = write_json_temporary(self.patients_filename, patients)
+            appointments_filename = write_json_temporary(self.appointments_filename, appointments)
+            # Other processes loading the data see both json files and the compacted journal part changed at once.
+            with self.locked():
+                os.replace(patients_filename, self.patients_filename)
+                os.replace(appointments_filename, self.appointments_filename)
+                sync_directory(os.path.dirname(self.patients_filename))
+                self.journal.finish_compaction()
+                self.write_versions(["patients", "appointments"])
+                self.stamps = self.read_stamps()
+        finally:
+            if self.compaction_lock is not None:
+                self.compaction_lock.release()
+
+    def close(self):
+        """
+        Compact the rest of the journal into json files and write the snapshot.
+        Changes of other processes are loaded first, so the snapshot has the same data as the json files.
+        """
+
+        if self.journal is not None:
+            if self.compaction is not None:
+                self.compaction.join()
+            if self.journal.records_count > 0 or os.path.exists(self.journal.compacting_filename):
+                self.compact_journal(wait=True)
+
+        if self.snapshot_filename is not None:
+            with self.locked():
+                self.refresh()
+                if self.journal is not None or not (self.patients_changed or self.appointments_changed):
+                    self.write_snapshot()
+
+        if self.journal is not None:
+            self.journal.close()
+        for lock in (self.data_lock, self.compaction_lock):
+            if lock is not None:
+                lock.close()
+
+    def get_patient(self, number):
+        return self.patients_by_number.get(number)
+
+    def get_all_patients(self):
+        return self.patients
+
+    def get_patients_after(self, number, count):
+        position = 0 if number is None else bisect.bisect_right(self.patient_numbers, number)
+        return [self.patients_by_number[patient_number]
+                for patient_number in self.patient_numbers[position:position + count]]
+
+    def get_patients_count(self):
+        return len(self.patients)
+
+    def add_patient(self, patient):
+        self.patients.append(patient)
+        self.patients_by_number[patient.number] = patient
+        bisect.insort(self.patient_numbers, patient.number)
+        self.patients_changed = True
+        self.record_change("add_patient", number=patient.number, firstname=patient.firstname,
+                           lastname=patient.lastname)
+
+    def release_appointments(self, number):
+        """
+        Set number in appointments of the deleted patient as 'patient_deleted'.
+
+        Arguments:
+            number (str): number of the deleted patient
+        """
+
+        patient_appointments = self.appointments_by_patient.pop(number, [])
+        for appointment in patient_appointments:
+            appointment.patient_number = "patient_deleted"
+        self.appointments_by_patient.setdefault("patient_deleted", []).extend(patient_appointments)
+        if patient_appointments:
+            self.appointments_changed = True
+
+    def delete_patient(self, number):
+        self.release_appointments(number)
+        self.patients.remove(self.patients_by_number.pop(number))
+        del self.patient_numbers[bisect.bisect_left(self.patient_numbers, number)]
+        self.patients_changed = True
+        self.appointments_changed = True
+        self.record_change("delete_patient", number=number)
+
+    def day_appointments(self, date):
+        """
+        Get appointments of the day from the date index.
+
+        Arguments:
+            date (date): appointment date
+
+        Returns:
+            day_appointments (Appointment[]): appointments of the day sorted by time, the list must not be changed
+        """
+
+        return self.appointments_by_date.get(date, ())
+
+    def get_appointment(self, date, time):
+        day_appointments = self.day_appointments(date)
+        position = bisect.bisect_left(day_appointments, time, key=appointment_time)
+        if position < len(day_appointments) and day_appointments[position].time == time:
+            return day_appointments[position]
+        return None
+
+    def get_overlapping_appointment(self, date, start, end):
+        day_appointments = self.day_appointments(date)
+        position = bisect.bisect_left(day_appointments, end, key=appointment_seconds)
+        if position > 0:
+            appointment = day_appointments[position - 1]
+            if appointment_seconds(appointment) + appointment.duration * 60 > start:
+                return appointment
+        return None
+
+    def get_appointments_by_date(self, date):
+        return list(self.day_appointments(date))
+
+    def get_appointments_between(self, start, end):
+        position = bisect.bisect_left(self.booked_dates, start.date())
+        while position < len(self.booked_dates) and self.booked_dates[position] <= end.date():
+            date = self.booked_dates[position]
+            day_appointments = self.appointments_by_date[date]
+            low, high = 0, len(day_appointments)
+            if date == start.date():
+                low = bisect.bisect_left(day_appointments, start.time(), key=appointment_time)
+            if date == end.date():
+                high = bisect.bisect_left(day_appointments, end.time(), key=appointment_time)
+            yield from day_appointments[low:high]
+            position += 1
+
+    def get_appointments_by_patient(self, number):
+        return list(self.appointments_by_patient.get(number, []))
+
+    def get_all_appointments(self):
+        return self.appointments
+
+    def get_appointments_count(self):
+        return len(self.appointments)
+
+    def add_appointment(self, appointment):
+        self.appointments.append(appointment)
+        if appointment.date not in self.appointments_by_date:
+            bisect.insort(self.booked_dates, appointment.date)
+        day_appointments = self.appointments_by_date.setdefault(appointment.date, [])
+        bisect.insort(day_appointments, appointment, key=appointment_time)
+        self.appointments_by_patient.setdefault(appointment.patient_number, []).append(appointment)
+        self.appointments_changed = True
+        self.record_change("add_appointment", patient_number=appointment.patient_number, date=appointment.date,
+                           time=appointment.time, description=appointment.description,
+                           duration=appointment.duration)
+
+    def delete_appointment(self, appointment):
+        self.appointments.remove(appointment)
+        day_appointments = self.appointments_by_date[appointment.date]
+        day_appointments.remove(appointment)
+        if not day_appointments:
+            del self.appointments_by_date[appointment.date]
+            del self.booked_dates[bisect.bisect_left(self.booked_dates, appointment.date)]
+        patient_appointments = self.appointments_by_patient[appointment.patient_number]
+        patient_appointments.remove(appointment)
+        if not patient_appointments:
+            del self.appointments_by_patient[appointment.patient_number]
+        self.appointments_changed = True
+        self.record_change("delete_appointment", date=appointment.date, time=appointment.time,
+                           patient_number=appointment.patient_number)
+
+    def delete_appointments_before(self, date):
+        position = bisect.bisect_left(self.booked_dates, date)
+        if position == 0:
+            return
+
+        for booked_date in self.booked_dates[:position]:
+            del self.appointments_by_date[booked_date]
+        del self.booked_dates[:position]
+        self.appointments = [appointment for appointment in self.appointments if appointment.date >= date]
+        for number, patient_appointments in list(self.appointments_by_patient.items()):
+            patient_appointments = [appointment for appointment in patient_appointments if appointment.date >= date]
+            if patient_appointments:
+                self.appointments_by_patient[number] = patient_appointments
+            else:
+                del self.appointments_by_patient[number]
+        self.appointments_changed = True
+        self.record_change("delete_appointments_before", date=date)
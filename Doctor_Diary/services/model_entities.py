@@ -1,3 +1,11 @@
+import datetime
+
+# Length of appointments booked without a duration (also all appointments saved before durations)
+DEFAULT_DURATION = 15
+# Appointments end before midnight, so none of them is longer than a day and days never share appointments
+MAX_DURATION = 24 * 60
+
+
 class Patient:
     """
     A class that represents a patient.
@@ -12,6 +20,8 @@ class Patient:
             Last name of the patient
     """
 
+    __slots__ = ("number", "firstname", "lastname")
+
     def __init__(self, number, firstname, lastname):
         self.number = number
         self.firstname = firstname
@@ -36,13 +46,28 @@ class Appointment:
             Time of the appointment formatted as [HH:MM:SS]
         description: str
             Short description of the appointment
+        duration: int
+            Length of the appointment in minutes, it occupies time from [time] to [time + duration]
     """
 
-    def __init__(self, patient_number, date, time, description):
+    __slots__ = ("patient_number", "date", "time", "description", "duration")
+
+    def __init__(self, patient_number, date, time, description, duration=DEFAULT_DURATION):
         self.patient_number = patient_number
         self.date = date
         self.time = time
         self.description = description
+        self.duration = duration
 
     def __str__(self):
-        return f"[{self.date}\t{self.time.strftime('%H:%M')}] \n\t{self.description}"
+        return f"[{self.date}\t{self.time.strftime('%H:%M')} - {self.end_time().strftime('%H:%M')}] \n\t{self.description}"
+
+    def end_time(self):
+        """
+        Get time when the appointment ends.
+
+        Returns:
+            end (time): end of the appointment (the time is wrapped after midnight)
+        """
+
+        return (datetime.datetime.combine(self.date, self.time) + datetime.timedelta(minutes=self.duration)).time()
@@ -1,52 +1,63 @@
+import base64
+import contextlib
+import datetime
 import json
 
 import services.model_entities as model_entities
-import helper_classes.json_service as json_service
+import services.free_slots as free_slots
+import services.json_storage as json_storage
+from helper_classes.group_commit import GroupCommit
+from helper_classes.name_index import NameIndex
 
 
-def load_patients(filename):
+def encode_cursor(position):
     """
-    Load registered patients from json file and convert them into Patient objects.
+    Encode position in a listing as an opaque page cursor.
 
     Arguments:
-        filename (str): relative path for patients.json file
+        position (list): json serializable position after the last item of the page
 
     Returns:
-        patients (Patient[]): list of registered patients
+        cursor (str): url safe page cursor
     """
 
-    with open(filename, "rt", encoding="utf8") as patients_file:
-        json_patients = json.loads(patients_file.read())
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf8")).decode("ascii")
 
-    patients = []
-    for json_patient in json_patients:
-        object_patient = model_entities.Patient(**json_patient)
-        patients.append(object_patient)
 
-    return patients
-
-
-def load_appointments(filename):
+def decode_cursor(cursor):
     """
-    Load booked appointments from json file and convert them into Appointment objects.
+    Decode page cursor made by encode_cursor.
 
     Arguments:
-        filename (str): relative path for appointments.json file
+        cursor (str): page cursor
 
     Returns:
-        appointments (Appointment[]): list of booked appointments
+        position (list): position after the last item of the previous page
     """
 
-    with open(filename, "rt", encoding="utf8") as appointments_file:
-        json_appointments = json.loads(appointments_file.read(),
-                                       object_hook=json_service.json_deserializer)
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError(f"Invalid page cursor: {cursor}")
+
+
+def days_period(first_date=None, last_date=None):
+    """
+    Get period of whole days for get_appointments_between. The period of the last representable day
+    (9999-12-31) ends with datetime.max, because the next midnight does not exist.
+
+    Arguments:
+        first_date (date | None): first day of the period, None for no limit
+        last_date (date | None): last day of the period (inclusive), None for no limit
 
-    appointments = []
-    for json_appointment in json_appointments:
-        object_appointment = model_entities.Appointment(**json_appointment)
-        appointments.append(object_appointment)
+    Returns:
+        period (datetime, datetime): beginning (inclusive) and end (exclusive) of the period
+    """
 
-    return appointments
+    start = datetime.datetime.combine(first_date or datetime.date.min, datetime.time.min)
+    if last_date is None or last_date == datetime.date.max:
+        return start, datetime.datetime.max
+    return start, datetime.datetime.combine(last_date + datetime.timedelta(days=1), datetime.time.min)
 
 
 class ModelManager:
@@ -55,43 +66,102 @@ class ModelManager:
 
     Attributes
     ----------
-        patients_filename: str
-            relative path for patients.json file
-        appointments_filename: str
-            relative path for appointments.json file
-        patients: Patient[]
-            list of registered patients
-        appointments: Appointment[]
-            list of booked appointments
+        storage: StorageBackend
+            storage of patients and appointments (json files or SQLite database)
+        group_commit: GroupCommit
+            service deciding when changes are flushed to disk
+        day_occupancy: dict[date, int]
+            cache of occupancy bitmaps (bit N is set if minute N is booked) of days searched for free slots
+        name_index: NameIndex | None
+            search index of patient names, built on the first search and then updated with every change,
+            including changes of other apps
+        archive: AppointmentArchive | None
+            compressed archives of past appointments moved out of the storage, None if they are not used
     """
 
-    def __init__(self, patients_filename, appointments_filename):
+    def __init__(self, storage, durability="operation", commit_operations=100, commit_delay_ms=200, archive=None):
+        """
+        Arguments:
+            storage (StorageBackend): storage of patients and appointments
+            durability (str): 'operation', 'coalesced' or 'exit' mode of flushing changes to disk
+            commit_operations (int): number of operations flushed together in coalesced mode
+            commit_delay_ms (int): maximal delay of the flush in coalesced mode
+            archive (AppointmentArchive | None): compressed archives of past appointments
+        """
+
+        self.storage = storage
+        self.archive = archive
+        self.group_commit = GroupCommit(self.flush_changes, durability, commit_operations, commit_delay_ms)
+        self.day_occupancy = {}
+        self.name_index = None
+
+    def save_changes(self):
+        """ Finish the operation. Changes are flushed to disk now or later, according to the durability mode. """
+
+        self.group_commit.operation_done()
+
+    def refresh(self):
+        """
+        Load changes made by other apps sharing the data (e.g. the console app and GUI apps
+        on other terminals). Call it before reading the model.
+        """
+
+        with self.group_commit.lock:
+            self.forget_changed(self.storage.refresh())
+
+    @contextlib.contextmanager
+    def change(self):
+        """
+        Hold the group commit lock and the data lock during a changing operation. Changes of other apps
+        are loaded first, so the checks of the operation (registered patient, free time slot) and the change
+        are made on current data and no other app can change it meanwhile.
         """
-        Loads registered patients and booked appointments from json files to object lists.
+
+        with self.group_commit.lock, self.storage.locked():
+            self.forget_changed(self.storage.refresh())
+            yield
+
+    def flush_changes(self):
+        """ Merge changes made by other apps and write changes of this app to disk. Called by the group commit. """
+
+        with self.storage.locked():
+            self.forget_changed(self.storage.refresh())
+            self.storage.flush()
+
+    def forget_changed(self, changed):
+        """
+        Drop caches of the data changed by other apps, they are built again on the next use.
+        The name index is updated with the changed patients instead, it takes long to build.
 
         Arguments:
-            patients_filename (str): relative path for patients.json file
-            appointments_filename (str): relative path for appointments.json file
+            changed (set[str]): 'patients' and/or 'appointments', parts of the data changed by other apps
         """
 
-        self.patients_filename = patients_filename
-        self.appointments_filename = appointments_filename
-        self.patients = load_patients(patients_filename)
-        self.appointments = load_appointments(appointments_filename)
+        if "patients" in changed and self.name_index is not None:
+            self.name_index.update(self.storage.get_all_patients())
+        if "appointments" in changed:
+            self.day_occupancy = {}
+
+    def take_conflicts(self):
+        """
+        Get info about changes dropped since the last call, because they conflict with changes made by other apps
+        before this app saved them (e.g. the same time slot booked for another patient).
 
-    def write_patients(self):
-        """ Save Patients list as json file"""
+        Returns:
+            statuses (str[]): info about every dropped change
+        """
 
-        with open(self.patients_filename, "wt", encoding="utf8") as patients_file:
-            json.dump(self.patients, patients_file,
-                      default=json_service.json_serializer, indent=4)
+        statuses = []
+        for record in self.storage.take_conflicts():
+            arguments = ", ".join(str(value) for name, value in record.items() if name != "operation")
+            statuses.append(f"CHANGE CONFLICTING WITH ANOTHER APP WAS DROPPED: {record['operation']} ({arguments})")
+        return statuses
 
-    def write_appointments(self):
-        """ Save Appointments list as json file."""
+    def close(self):
+        """ Flush pending changes and close the storage. Call it before the app exits. """
 
-        with open(self.appointments_filename, "wt", encoding="utf8") as appointments_file:
-            json.dump(self.appointments, appointments_file,
-                      default=json_service.json_serializer, indent=4)
+        self.group_commit.close()
+        self.storage.close()
 
     def add_patient(self, number, firstname, lastname):
         """
@@ -106,39 +176,55 @@ class ModelManager:
             status (str): info about operation status
         """
 
-        exist = self.get_patient_by_number(number)
-        if exist is not None:
-            return "PATIENT WITH THE PROVIDED number IS ALREADY REGISTERED"
+        with self.change():
+            exist = self.get_patient_by_number(number)
+            if exist is not None:
+                return "PATIENT WITH THE PROVIDED number IS ALREADY REGISTERED"
 
-        new_patient = model_entities.Patient(number, firstname, lastname)
-        self.patients.append(new_patient)
-        return "PATIENT HAS BEEN ADDED"
+            new_patient = model_entities.Patient(number, firstname, lastname)
+            self.storage.add_patient(new_patient)
+            if self.name_index is not None:
+                self.name_index.add(new_patient)
+            return "PATIENT HAS BEEN ADDED"
 
-    def add_appointment(self, patient_number, date, time, description):
+    def add_appointment(self, patient_number, date, time, description, duration=model_entities.DEFAULT_DURATION):
         """
         Add new appointment and return info about operation status.
 
         Arguments:
             patient_number (str): patient number
             date (date): appointment date
-            time (time): appointment time
+            time (time): appointment time, fractions of a second are dropped
             description (str): appointment description
+            duration (int): appointment length in minutes
 
         Returns:
             status (str): info about operation status
         """
 
-        exist = self.get_patient_by_number(patient_number)
-        if exist is None:
-            return "PATIENT WITH THE PROVIDED number IS NOT REGISTERED"
+        # Every storage keeps appointments with second precision (like times parsed from json files).
+        time = time.replace(microsecond=0)
+        with self.change():
+            exist = self.get_patient_by_number(patient_number)
+            if exist is None:
+                return "PATIENT WITH THE PROVIDED number IS NOT REGISTERED"
 
-        busy = self.get_busy_appointment(date, time)
-        if busy is not None:
-            return "THE SELECTED TIME SLOT IS ALREADY BOOKED"
+            if duration < 1:
+                return "APPOINTMENT DURATION HAS TO BE POSITIVE"
 
-        new_appointment = model_entities.Appointment(patient_number, date, time, description)
-        self.appointments.append(new_appointment)
-        return "APPOINTMENT HAS BEEN ADDED"
+            # Only appointments of the same day are checked for overlaps.
+            if json_storage.time_to_seconds(time) + duration * 60 > model_entities.MAX_DURATION * 60:
+                return "APPOINTMENT HAS TO END BEFORE MIDNIGHT"
+
+            busy = self.get_overlapping_appointment(date, time, duration)
+            if busy is not None:
+                return "THE SELECTED TIME SLOT IS ALREADY BOOKED"
+
+            new_appointment = model_entities.Appointment(patient_number, date, time, description, duration)
+            self.storage.add_appointment(new_appointment)
+            if date in self.day_occupancy:
+                self.day_occupancy[date] |= free_slots.booked_minutes(time, duration)
+            return "APPOINTMENT HAS BEEN ADDED"
 
     def delete_patient(self, number):
         """
@@ -152,16 +238,17 @@ class ModelManager:
             status (str): info about operation status
         """
 
-        exist = self.get_patient_by_number(number)
-        if exist is None:
-            return "PATIENT WITH THE PROVIDED number IS NOT REGISTERED"
-
-        patient_appointments = self.get_appointments_by_number(number)
-        for appointment in patient_appointments:
-            appointment.patient_number = "patient_deleted"
+        with self.change():
+            exist = self.get_patient_by_number(number)
+            if exist is None:
+                return "PATIENT WITH THE PROVIDED number IS NOT REGISTERED"
 
-        self.patients.remove(exist)
-        return "PATIENT HAS BEEN DELETED"
+            self.storage.delete_patient(number)
+            if self.archive is not None:
+                self.archive.delete_patient(number)
+            if self.name_index is not None:
+                self.name_index.remove(exist)
+            return "PATIENT HAS BEEN DELETED"
 
     def delete_appointment(self, date, time):
         """
@@ -175,12 +262,15 @@ class ModelManager:
             status (str): info about operation status
         """
 
-        busy = self.get_busy_appointment(date, time)
-        if busy is None:
-            return "THE SELECTED TIME SLOT DOES NOT HAVE A BOOKED APPOINTMENT"
+        with self.change():
+            busy = self.get_busy_appointment(date, time)
+            if busy is None:
+                return "THE SELECTED TIME SLOT DOES NOT HAVE A BOOKED APPOINTMENT"
 
-        self.appointments.remove(busy)
-        return "APPOINTMENT HAS BEEN CANCELED"
+            self.storage.delete_appointment(busy)
+            # Other appointment can be booked in the same minute, the bitmap is rebuilt on the next search.
+            self.day_occupancy.pop(date, None)
+            return "APPOINTMENT HAS BEEN CANCELED"
 
     def get_patient_by_number(self, number):
         """
@@ -194,14 +284,29 @@ class ModelManager:
             or None if patient with specified number is not registered
         """
 
-        for patient in self.patients:
-            if patient.number == number:
-                return patient
-        return None
+        return self.storage.get_patient(number)
+
+    def search_patients(self, text, limit=20):
+        """
+        Find patients by first name, last name or both. Names are matched by prefix
+        and with a few typos, case and accents are ignored.
+
+        Arguments:
+            text (str): searched names (or their beginnings)
+            limit (int): maximal number of found patients
+
+        Returns:
+            patients (Patient[]): found patients, best matches first
+        """
+
+        if self.name_index is None:
+            self.name_index = NameIndex(self.storage.get_all_patients())
+        return [self.storage.get_patient(number) for number in self.name_index.search(text, limit)]
 
     def get_appointments_by_number(self, number):
         """
-        Get appointments for patient specified by his number.
+        Get appointments for patient specified by his number. Archived appointments are read
+        from the archives with streaming decompression and returned before the booked ones.
 
         Arguments:
             number (str): patient number
@@ -211,17 +316,44 @@ class ModelManager:
             or None if patient with specified number is not registered
         """
 
-        patient_appointments = []
-
         exist = self.get_patient_by_number(number)
         if exist is None:
             return None
 
-        for appointment in self.appointments:
-            if appointment.patient_number == number:
-                patient_appointments.append(appointment)
+        patient_appointments = self.storage.get_appointments_by_patient(number)
+        if self.archive is None:
+            return patient_appointments
+
+        # Appointments archived by an interrupted archive command can be still booked in the storage.
+        booked_slots = {(appointment.date, appointment.time) for appointment in patient_appointments}
+        archived = [appointment for appointment in self.archive.get_appointments_by_patient(number)
+                    if (appointment.date, appointment.time) not in booked_slots]
+        return archived + patient_appointments
+
+    def archive_appointments(self, before):
+        """
+        Move appointments booked before specified date into compressed archives of their years,
+        so the storage keeps only recent appointments. Appointments are written to the archives first,
+        so they are not lost if the app is interrupted before the storage is saved.
+
+        Arguments:
+            before (date): first day of appointments which stay in the storage
 
-        return patient_appointments
+        Returns:
+            archived_count (int): number of archived appointments
+        """
+
+        with self.change():
+            start = datetime.datetime.combine(datetime.date.min, datetime.time.min)
+            end = datetime.datetime.combine(before, datetime.time.min)
+            archived = list(self.storage.get_appointments_between(start, end))
+            if not archived:
+                return 0
+
+            self.archive.add_appointments(archived)
+            self.storage.delete_appointments_before(before)
+            self.day_occupancy = {date: occupancy for date, occupancy in self.day_occupancy.items() if date >= before}
+            return len(archived)
 
     def get_appointments_by_date(self, date):
         """
@@ -231,16 +363,63 @@ class ModelManager:
             date (date): [YYYY-MM-DD] formatted date of the appointment
 
         Returns:
-            day_appointments (Appointment[]): list of appointments for specified date
+            day_appointments (Appointment[]): list of appointments for specified date sorted by time
+        """
+
+        return self.storage.get_appointments_by_date(date)
+
+    def get_appointments_between(self, start, end):
+        """
+        Get appointments booked in the specified period. Appointments are streamed
+        from the sorted date index, so the cost depends on the number of returned appointments only.
+
+        Arguments:
+            start (datetime): beginning of the period (inclusive)
+            end (datetime): end of the period (exclusive)
+
+        Returns:
+            appointments (generator of Appointment): appointments sorted by date and time
+        """
+
+        return self.storage.get_appointments_between(start, end)
+
+    def get_day_occupancy(self, date):
+        """
+        Get occupancy bitmap of the day, it is built from day appointments on the first use.
+
+        Arguments:
+            date (date): day of the bitmap
+
+        Returns:
+            occupancy (int): bitmap with bit N set if minute N of the day is booked
         """
 
-        patient_appointments = []
+        occupancy = self.day_occupancy.get(date)
+        if occupancy is None:
+            day_appointments = self.storage.get_appointments_by_date(date)
+            occupancy = free_slots.occupancy_bitmap((appointment.time, appointment.duration)
+                                                    for appointment in day_appointments)
+            self.day_occupancy[date] = occupancy
+        return occupancy
+
+    def find_free_slots(self, from_date, count=10, slot_length=15, working_hours=None, holidays=()):
+        """
+        Find first free slots in working hours, starting from the specified date.
 
-        for appointment in self.appointments:
-            if appointment.date == date:
-                patient_appointments.append(appointment)
+        Arguments:
+            from_date (date | datetime): first day of the search, slots before datetime time are skipped
+            count (int): number of searched slots
+            slot_length (int): slot length in minutes
+            working_hours (dict[int, (time, time)] | None): working hours keyed by weekday (Monday is 0),
+            None for Monday - Friday 08:00 - 16:00
+            holidays (iterable of date): free days
+
+        Returns:
+            slots (datetime[]): starts of free slots
+        """
 
-        return patient_appointments
+        return free_slots.find_free_slots(self.get_day_occupancy, from_date, count, slot_length,
+                                          working_hours, holidays)
 
     def get_busy_appointment(self, date, time):
         """
@@ -248,18 +427,48 @@ class ModelManager:
 
         Arguments:
             date (date): [YYYY-MM-DD] formatted date
-            time (time): [HH:MM:SS] specified time
+            time (time): [HH:MM:SS] start time of the appointment
 
         Returns:
-             appointment (Appointment): appointment which occupied specified date, time
+             appointment (Appointment): appointment which starts at specified date, time
              or None if appointment with specified date, time is not busy
         """
 
-        day_appointments = self.get_appointments_by_date(date)
-        for appointment in day_appointments:
-            if appointment.time == time:
-                return appointment
-        return None
+        return self.storage.get_appointment(date, time)
+
+    def get_overlapping_appointment(self, date, time, duration):
+        """
+        Get appointment which collides with an appointment of specified date, time and duration.
+        It is a single binary search in the day appointments sorted by time.
+
+        Arguments:
+            date (date): [YYYY-MM-DD] formatted date
+            time (time): [HH:MM:SS] start time of the checked appointment
+            duration (int): length of the checked appointment in minutes
+
+        Returns:
+             appointment (Appointment | None): booked appointment overlapping the checked one
+             or None if the time is free
+        """
+
+        start = json_storage.time_to_seconds(time)
+        return self.storage.get_overlapping_appointment(date, start, start + duration * 60)
+
+    def get_appointment_at(self, date, time):
+        """
+        Get appointment running in specified date, time (who is in the room).
+
+        Arguments:
+            date (date): [YYYY-MM-DD] formatted date
+            time (time): [HH:MM:SS] specified time
+
+        Returns:
+             appointment (Appointment | None): appointment which started before or at specified time
+             and has not ended yet, or None if nobody is appointed at that time
+        """
+
+        start = json_storage.time_to_seconds(time)
+        return self.storage.get_overlapping_appointment(date, start, start + 1)
     
     def get_patients_count(self):
         """
@@ -269,7 +478,7 @@ class ModelManager:
              patients_count (int): number of all registered patients
         """
 
-        return len(self.patients)
+        return self.storage.get_patients_count()
 
     def get_all_registered_patients(self):
         """
@@ -279,7 +488,84 @@ class ModelManager:
             patients (Patient[]): list of all registered patients
         """
 
-        return self.patients
+        return self.storage.get_all_patients()
+
+    def get_patients_page(self, cursor=None, page_size=20, number_prefix=""):
+        """
+        Get a page of registered patients sorted by number. Pages are found by the sorted number index,
+        so every page costs the same and pages do not skip or repeat patients when others are added or deleted.
+        Numbers starting with the prefix follow each other in the index, so filtered pages cost the same too.
+
+        Arguments:
+            cursor (str | None): cursor returned with the previous page, None for the first page
+            page_size (int): maximal number of patients on the page
+            number_prefix (str): only patients with numbers starting with it are listed
+
+        Returns:
+            page (Patient[], str | None): patients of the page and cursor of the next page
+            (None if it is the last page) in a tuple
+        """
+
+        patients = []
+        if cursor is not None:
+            after_number = decode_cursor(cursor)[0]
+        elif number_prefix:
+            # The prefix itself is the first number starting with it, the following ones are greater.
+            exact = self.storage.get_patient(number_prefix)
+            if exact is not None:
+                patients.append(exact)
+            after_number = number_prefix
+        else:
+            after_number = None
+
+        for patient in self.storage.get_patients_after(after_number, page_size + 1 - len(patients)):
+            if not patient.number.startswith(number_prefix):
+                break
+            patients.append(patient)
+        if len(patients) <= page_size:
+            return patients, None
+        del patients[page_size:]
+        return patients, encode_cursor([patients[-1].number])
+
+    def get_appointments_page(self, cursor=None, page_size=20):
+        """
+        Get a page of booked appointments sorted by date and time. Pages are streamed from the date index
+        (see get_appointments_between), so every page costs the same regardless of its number.
+
+        Arguments:
+            cursor (str | None): cursor returned with the previous page, None for the first page
+            page_size (int): maximal number of appointments on the page
+
+        Returns:
+            page (Appointment[], str | None): appointments of the page and cursor of the next page
+            (None if it is the last page) in a tuple
+        """
+
+        start, skipped = datetime.datetime.min, 0
+        if cursor is not None:
+            start_text, skipped = decode_cursor(cursor)
+            start = datetime.datetime.fromisoformat(start_text)
+
+        # Appointments starting at the cursor time which were already listed on previous pages are skipped.
+        page, skip = [], skipped
+        for appointment in self.get_appointments_between(start, datetime.datetime.max):
+            if skip and datetime.datetime.combine(appointment.date, appointment.time) == start:
+                skip -= 1
+                continue
+            page.append(appointment)
+            if len(page) > page_size:
+                break
+
+        if len(page) <= page_size:
+            return page, None
+        del page[page_size:]
+
+        last = datetime.datetime.combine(page[-1].date, page[-1].time)
+        same_time = sum(1 for appointment in page
+                        if datetime.datetime.combine(appointment.date, appointment.time) == last)
+        if last == start:
+            same_time += skipped
+        return page, encode_cursor([last.isoformat(), same_time])
 
     def get_appointments_count(self):
         """
@@ -289,7 +575,7 @@ class ModelManager:
              appointments_count (int): number of all booked appointments patients
         """
 
-        return len(self.appointments)
+        return self.storage.get_appointments_count()
 
     def get_all_booked_appointments(self):
         """
@@ -299,4 +585,4 @@ class ModelManager:
             appointments (Appointment[]): list of all booked appointments
         """
 
-        return self.appointments
\ No newline at end of file
+        return self.storage.get_all_appointments()
\ No newline at end of file
@@ -0,0 +1,461 @@
+import bisect
+import collections
+import datetime
+import json
+import os
+
+from services.json_storage import JsonStorage, appointment_seconds, appointment_time, load_appointments, \
+    sync_directory, write_json
+
+
+def month_key(date):
+    """
+    Get key of the month shard containing appointments of the date.
+
+    Arguments:
+        date (date): appointment date
+
+    Returns:
+        month (str): month formatted as [YYYY-MM]
+    """
+
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+def save_json(filename, data):
+    """
+    Save json data (manifest, patient index) to a temporary file which replaces the target file
+    when it is safely on disk.
+
+    Arguments:
+        filename (str): relative path for json file
+        data (dict): json serializable data
+    """
+
+    temporary_filename = filename + ".tmp"
+    with open(temporary_filename, "wt", encoding="utf8") as json_file:
+        json.dump(data, json_file)
+        json_file.flush()
+        os.fsync(json_file.fileno())
+    os.replace(temporary_filename, filename)
+
+
+class AppointmentShard:
+    """
+    A class that represents appointments of one month, stored in one shard file.
+
+    Attributes
+    ----------
+        month: str
+            month of the appointments formatted as [YYYY-MM]
+        version: int
+            version of the shard file the appointments were loaded from (or written to)
+        appointments_by_date: dict[date, Appointment[]]
+            booked appointments keyed by date, every day list sorted by time
+        booked_dates: date[]
+            sorted keys of appointments_by_date
+        count: int
+            number of appointments in the shard
+        changed: bool
+            True if appointments were changed since the shard was loaded or written, changed shards are never evicted
+    """
+
+    def __init__(self, month, appointments, version=0):
+        """
+        Arguments:
+            month (str): month of the appointments formatted as [YYYY-MM]
+            appointments (Appointment[]): appointments of the month
+            version (int): version of the shard file the appointments were loaded from
+        """
+
+        self.month = month
+        self.version = version
+        self.appointments_by_date = {}
+        for appointment in sorted(appointments, key=appointment_time):
+            self.appointments_by_date.setdefault(appointment.date, []).append(appointment)
+        self.booked_dates = sorted(self.appointments_by_date)
+        self.count = len(appointments)
+        self.changed = False
+
+    def add(self, appointment):
+        """
+        Add appointment to the shard.
+
+        Arguments:
+            appointment (Appointment): new appointment of the month
+        """
+
+        if appointment.date not in self.appointments_by_date:
+            bisect.insort(self.booked_dates, appointment.date)
+        day_appointments = self.appointments_by_date.setdefault(appointment.date, [])
+        bisect.insort(day_appointments, appointment, key=appointment_time)
+        self.count += 1
+        self.changed = True
+
+    def remove(self, appointment):
+        """
+        Remove appointment from the shard.
+
+        Arguments:
+            appointment (Appointment): appointment of the shard
+        """
+
+        day_appointments = self.appointments_by_date[appointment.date]
+        day_appointments.remove(appointment)
+        if not day_appointments:
+            del self.appointments_by_date[appointment.date]
+            del self.booked_dates[bisect.bisect_left(self.booked_dates, appointment.date)]
+        self.count -= 1
+        self.changed = True
+
+    def appointments(self):
+        """
+        Get all appointments of the shard.
+
+        Returns:
+            appointments (generator of Appointment): appointments sorted by date and time
+        """
+
+        for date in self.booked_dates:
+            yield from self.appointments_by_date[date]
+
+
+class ShardedStorage(JsonStorage):
+    """
+    A json storage which keeps appointments in month shards (appointments/YYYY-MM.json files) listed
+    in a small manifest, instead of one appointments.json file. Shards are loaded when a query touches
+    them and kept in an LRU cache capped by the number of appointments, so startup time and resident
+    memory depend on the months in use, not on the whole history. Appointments of a patient are found
+    through an index of months with his appointments, loaded on the first use.
+    Patients are kept in patients.json as in JsonStorage. Changes are saved with full persistence
+    (changed shards are rewritten by every flush), the journal and the snapshot are not used.
+    Appointments of a patient and all appointments are returned in date order, not in booking order.
+    The first start moves appointments from appointments.json (it is not changed) into shards.
+
+    Attributes
+    ----------
+        shards_directory: str
+            relative path for directory with shard files, the manifest and the patient index
+        manifest_filename: str
+            relative path for the manifest with appointments count and version of every shard
+        patient_months_filename: str
+            relative path for the index of months with appointments of every patient
+        max_resident_appointments: int
+            maximal number of appointments in loaded shards (one appointment takes roughly 300 B),
+            least recently used shards which are not changed are evicted over the limit
+        manifest: dict[str, dict]
+            appointments count and version of every shard keyed by month
+        shards: OrderedDict[str, AppointmentShard]
+            loaded shards keyed by month, the least recently used first
+        resident_appointments: int
+            number of appointments in loaded shards
+        appointments_count: int
+            number of all booked appointments
+        patient_months: dict[str, str[]] | None
+            months with appointments of every patient keyed by patient number, None until the first use
+        patient_months_changed: bool
+            True if the patient index was changed since the last flush
+    """
+
+    def __init__(self, patients_filename, appointments_filename, shards_directory, max_resident_appointments=100000,
+                 lock_filename=None):
+        """
+        Arguments:
+            patients_filename (str): relative path for patients.json file
+            appointments_filename (str): relative path for appointments.json file moved into shards on the first start
+            shards_directory (str): relative path for directory with shard files
+            max_resident_appointments (int): maximal number of appointments in loaded shards
+            lock_filename (str | None): relative path for lock file of the data files shared with other processes,
+            None if the files are used by this process only
+        """
+
+        self.shards_directory = shards_directory
+        self.manifest_filename = os.path.join(shards_directory, "manifest.json")
+        self.patient_months_filename = os.path.join(shards_directory, "patient_months.json")
+        self.max_resident_appointments = max_resident_appointments
+        self.shards = collections.OrderedDict()
+        self.resident_appointments = 0
+        super().__init__(patients_filename, appointments_filename, lock_filename=lock_filename)
+
+    def json_filenames(self):
+        # Shards are listed in the manifest, it is rewritten whenever appointments change.
+        return self.patients_filename, self.manifest_filename
+
+    def shard_filename(self, month):
+        """
+        Get shard file of the month.
+
+        Arguments:
+            month (str): month formatted as [YYYY-MM]
+
+        Returns:
+            filename (str): relative path for the shard file
+        """
+
+        return os.path.join(self.shards_directory, month + ".json")
+
+    def read_appointments(self):
+        """
+        Read the manifest of shards, appointments are loaded later from the shards touched by queries.
+        Loaded shards which are changed (by other processes or by changes which are not flushed yet) are dropped.
+        """
+
+        if not os.path.exists(self.manifest_filename):
+            self.split_appointments()
+
+        with open(self.manifest_filename, "rt", encoding="utf8") as manifest_file:
+            self.manifest = json.load(manifest_file)["shards"]
+        self.appointments_count = sum(shard["count"] for shard in self.manifest.values())
+        for month, shard in list(self.shards.items()):
+            if shard.changed or shard.version != self.manifest.get(month, {}).get("version"):
+                self.drop_shard(month)
+        self.patient_months = None
+        self.patient_months_changed = False
+
+    def split_appointments(self):
+        """ Move appointments from appointments.json file into month shards and write their manifest. """
+
+        os.makedirs(self.shards_directory, exist_ok=True)
+        months = {}
+        if os.path.exists(self.appointments_filename):
+            for appointment in load_appointments(self.appointments_filename):
+                months.setdefault(month_key(appointment.date), []).append(appointment)
+
+        patient_months = {}
+        for month, appointments in months.items():
+            write_json(self.shard_filename(month), appointments)
+            for number in {appointment.patient_number for appointment in appointments}:
+                patient_months.setdefault(number, []).append(month)
+        save_json(self.patient_months_filename, patient_months)
+        # The manifest is written last, a split interrupted before it is repeated on the next start.
+        save_json(self.manifest_filename, {"shards": {month: {"count": len(appointments), "version": 1}
+                                                      for month, appointments in months.items()}})
+        sync_directory(self.shards_directory)
+
+    def shard(self, month, create=False):
+        """
+        Get shard of the month, it is loaded from its file if it is not in the cache.
+
+        Arguments:
+            month (str): month formatted as [YYYY-MM]
+            create (bool): create an empty shard if the month does not have any appointments yet
+
+        Returns:
+            shard (AppointmentShard | None): shard of the month, None if it does not exist and create is False
+        """
+
+        shard = self.shards.get(month)
+        if shard is not None:
+            self.shards.move_to_end(month)
+            return shard
+
+        if month in self.manifest:
+            # Shards emptied by the archive do not have files.
+            appointments = load_appointments(self.shard_filename(month)) if self.manifest[month]["count"] else []
+            shard = AppointmentShard(month, appointments, self.manifest[month]["version"])
+        elif create:
+            shard = AppointmentShard(month, [])
+        else:
+            return None
+
+        self.shards[month] = shard
+        self.resident_appointments += shard.count
+        self.evict_shards()
+        return shard
+
+    def evict_shards(self):
+        """ Drop the least recently used shards which are not changed, until loaded shards fit in the limit. """
+
+        for month, shard in list(self.shards.items())[:-1]:
+            if self.resident_appointments <= self.max_resident_appointments:
+                return
+            if not shard.changed:
+                self.drop_shard(month)
+
+    def drop_shard(self, month):
+        """
+        Remove shard from the cache.
+
+        Arguments:
+            month (str): month of the loaded shard
+        """
+
+        self.resident_appointments -= self.shards.pop(month).count
+
+    def booked_months(self):
+        """
+        Get months which have (or had) booked appointments.
+
+        Returns:
+            months (str[]): sorted months of existing shards, including new ones which are not flushed yet
+        """
+
+        return sorted({month for month, shard in self.manifest.items() if shard["count"]} | self.shards.keys())
+
+    def patient_index(self):
+        """
+        Get index of months with appointments of every patient, it is loaded on the first use.
+
+        Returns:
+            patient_months (dict[str, str[]]): months with appointments keyed by patient number
+        """
+
+        if self.patient_months is None:
+            with open(self.patient_months_filename, "rt", encoding="utf8") as index_file:
+                self.patient_months = json.load(index_file)
+        return self.patient_months
+
+    def add_patient_month(self, number, month):
+        """
+        Add month into the index of months with appointments of the patient.
+
+        Arguments:
+            number (str): patient number
+            month (str): month formatted as [YYYY-MM]
+        """
+
+        months = self.patient_index().setdefault(number, [])
+        if month not in months:
+            bisect.insort(months, month)
+            self.patient_months_changed = True
+
+    def write_appointments(self):
+        """ Save changed shards, the patient index and the manifest. """
+
+        self.appointments_changed = False
+        try:
+            for shard in list(self.shards.values()):
+                if shard.changed:
+                    shard.version = self.manifest.get(shard.month, {}).get("version", 0) + 1
+                    if shard.count:
+                        write_json(self.shard_filename(shard.month), list(shard.appointments()))
+                    elif os.path.exists(self.shard_filename(shard.month)):
+                        os.remove(self.shard_filename(shard.month))
+                    self.manifest[shard.month] = {"count": shard.count, "version": shard.version}
+                    shard.changed = False
+            if self.patient_months_changed:
+                save_json(self.patient_months_filename, self.patient_months)
+                self.patient_months_changed = False
+            save_json(self.manifest_filename, {"shards": self.manifest})
+        except OSError:
+            self.appointments_changed = True
+            raise
+        self.evict_shards()
+
+    def get_appointments_count(self):
+        return self.appointments_count
+
+    def day_appointments(self, date):
+        shard = self.shard(month_key(date))
+        if shard is None:
+            return ()
+        return shard.appointments_by_date.get(date, ())
+
+    def get_appointments_between(self, start, end):
+        first_month, last_month = month_key(start.date()), month_key(end.date())
+        for month in self.booked_months():
+            if month < first_month or month > last_month:
+                continue
+
+            shard = self.shard(month)
+            position = bisect.bisect_left(shard.booked_dates, start.date())
+            # Dates are copied, the shard can be evicted and changed while appointments are consumed.
+            for date in shard.booked_dates[position:]:
+                if date > end.date():
+                    return
+                day_appointments = shard.appointments_by_date[date]
+                low, high = 0, len(day_appointments)
+                if date == start.date():
+                    low = bisect.bisect_left(day_appointments, start.time(), key=appointment_time)
+                if date == end.date():
+                    high = bisect.bisect_left(day_appointments, end.time(), key=appointment_time)
+                yield from day_appointments[low:high]
+
+    def get_appointments_by_patient(self, number):
+        patient_appointments = []
+        for month in self.patient_index().get(number, ()):
+            shard = self.shard(month)
+            if shard is not None:
+                patient_appointments.extend(appointment for appointment in shard.appointments()
+                                            if appointment.patient_number == number)
+        return patient_appointments
+
+    def get_all_appointments(self):
+        return self.get_appointments_between(datetime.datetime.min, datetime.datetime.max)
+
+    def add_appointment(self, appointment):
+        month = month_key(appointment.date)
+        shard = self.shard(month, create=True)
+        shard.add(appointment)
+        self.resident_appointments += 1
+        self.appointments_count += 1
+        self.add_patient_month(appointment.patient_number, month)
+        self.appointments_changed = True
+        self.record_change("add_appointment", patient_number=appointment.patient_number, date=appointment.date,
+                           time=appointment.time, description=appointment.description,
+                           duration=appointment.duration)
+
+    def delete_appointment(self, appointment):
+        shard = self.shard(month_key(appointment.date))
+        booked = shard.appointments_by_date[appointment.date]
+        position = bisect.bisect_left(booked, appointment_seconds(appointment), key=appointment_seconds)
+        shard.remove(booked[position])
+        self.resident_appointments -= 1
+        self.appointments_count -= 1
+        self.appointments_changed = True
+        self.record_change("delete_appointment", date=appointment.date, time=appointment.time,
+                           patient_number=appointment.patient_number)
+
+    def release_appointments(self, number):
+        months = self.patient_index().pop(number, [])
+        for month in months:
+            shard = self.shard(month)
+            if shard is None:
+                continue
+            for appointment in shard.appointments():
+                if appointment.patient_number == number:
+                    appointment.patient_number = "patient_deleted"
+                    shard.changed = True
+            self.add_patient_month("patient_deleted", month)
+        if months:
+            self.patient_months_changed = True
+            self.appointments_changed = True
+
+    def delete_appointments_before(self, date):
+        first_month = month_key(date)
+        deleted_count = 0
+        for month in self.booked_months():
+            if month > first_month:
+                break
+
+            if month == first_month:
+                shard = self.shard(month)
+                for appointment in [appointment for appointment in shard.appointments() if appointment.date < date]:
+                    shard.remove(appointment)
+                    self.resident_appointments -= 1
+                    deleted_count += 1
+                continue
+
+            # Whole month is deleted, its shard is replaced by an empty one without loading it.
+            cached_shard = self.shards.get(month)
+            count = cached_shard.count if cached_shard is not None else self.manifest[month]["count"]
+            if cached_shard is not None:
+                self.drop_shard(month)
+            shard = AppointmentShard(month, [])
+            shard.changed = True
+            self.shards[month] = shard
+            deleted_count += count
+
+        if deleted_count == 0:
+            return
+
+        for number, months in list(self.patient_index().items()):
+            months = [month for month in months if month >= first_month]
+            if months:
+                self.patient_months[number] = months
+            else:
+                del self.patient_months[number]
+        self.patient_months_changed = True
+        self.appointments_count -= deleted_count
+        self.appointments_changed = True
+        self.record_change("delete_appointments_before", date=date)
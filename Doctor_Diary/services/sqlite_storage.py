@@ -0,0 +1,258 @@
+import contextlib
+import datetime
+import os
+import sqlite3
+
+import services.model_entities as model_entities
+import helper_classes.json_service as json_service
+import services.json_storage as json_storage
+from services.storage_backend import StorageBackend
+
+
+SCHEMA = f"""
+    CREATE TABLE IF NOT EXISTS patients (
+        id INTEGER PRIMARY KEY,
+        number TEXT NOT NULL UNIQUE,
+        firstname TEXT NOT NULL,
+        lastname TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS appointments (
+        id INTEGER PRIMARY KEY,
+        patient_number TEXT NOT NULL,
+        date TEXT NOT NULL,
+        time TEXT NOT NULL,
+        description TEXT NOT NULL,
+        duration INTEGER NOT NULL DEFAULT {model_entities.DEFAULT_DURATION}
+    );
+    CREATE INDEX IF NOT EXISTS appointments_patient_number ON appointments (patient_number);
+    CREATE INDEX IF NOT EXISTS appointments_date_time ON appointments (date, time);
+"""
+
+APPOINTMENT_COLUMNS = "patient_number, date, time, description, duration"
+
+
+def row_to_appointment(row):
+    """
+    Convert appointments table row into Appointment object.
+
+    Arguments:
+        row (tuple): patient_number, date, time, description, duration columns
+
+    Returns:
+        appointment (Appointment): appointment stored in the row
+    """
+
+    patient_number, date, time, description, duration = row
+    return model_entities.Appointment(patient_number, json_service.parse_date(date),
+                                      json_service.parse_time(time), description, duration)
+
+
+def seconds_to_text(seconds):
+    """
+    Format seconds since midnight as time column text. Seconds after the end of the day
+    are formatted as '24:00:00', which is sorted after every time of the day.
+
+    Arguments:
+        seconds (int): seconds since midnight
+
+    Returns:
+        text (str): [HH:MM:SS] formatted time
+    """
+
+    if seconds >= 24 * 3600:
+        return "24:00:00"
+    return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60).isoformat()
+
+
+class SqliteStorage(StorageBackend):
+    """
+    A storage keeping patients and appointments in SQLite database file.
+    Nothing is loaded at startup, every lookup, insert and delete is an indexed single-row query.
+    Dates and times are stored as ISO formatted text, so they are sorted chronologically.
+    The database can be shared by several processes, SQLite locks it for the writing transaction,
+    which is committed when the operation ends. Flush only makes the committed changes durable.
+
+    Attributes
+    ----------
+        filename: str
+            relative path for the database file
+        connection: Connection
+            connection to the database, changes are committed when the outermost lock is released
+        data_version: int
+            data version of the database seen by the last refresh, it changes when another process commits
+    """
+
+    def __init__(self, filename, patients_filename=None, appointments_filename=None):
+        """
+        Open (or create) the database. A new database is filled with patients and appointments
+        from json files, so the app can switch from json storage without losing data.
+
+        Arguments:
+            filename (str): relative path for the database file
+            patients_filename (str | None): relative path for patients.json file imported into a new database
+            appointments_filename (str | None): relative path for appointments.json file imported into a new database
+        """
+
+        self.filename = filename
+        new_database = not os.path.exists(filename)
+        # Group commit flushes from its timer thread, the lock held during changes serializes access.
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        # Commits are not synced, flush syncs the write-ahead log when the durability mode asks for it.
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        columns = [column[1] for column in self.connection.execute("PRAGMA table_info(appointments)")]
+        if "duration" not in columns:
+            # Database created before appointments had durations.
+            self.connection.execute(f"ALTER TABLE appointments ADD COLUMN duration INTEGER NOT NULL "
+                                    f"DEFAULT {model_entities.DEFAULT_DURATION}")
+
+        if new_database:
+            if patients_filename is not None and os.path.exists(patients_filename):
+                for patient in json_storage.load_patients(patients_filename):
+                    self.add_patient(patient)
+            if appointments_filename is not None and os.path.exists(appointments_filename):
+                for appointment in json_storage.load_appointments(appointments_filename):
+                    self.add_appointment(appointment)
+            self.connection.commit()
+        self.data_version = self.read_data_version()
+
+    def read_data_version(self):
+        """
+        Read data version of the database, it changes when another connection commits changes.
+
+        Returns:
+            data_version (int): current data version
+        """
+
+        return self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    @contextlib.contextmanager
+    def locked(self):
+        # The writing transaction starts before the checks of the operation and it is committed
+        # when the operation ends, so other processes wait only for the operation, not for the flush.
+        if self.connection.in_transaction:
+            yield self
+            return
+
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield self
+        except BaseException:
+            self.connection.rollback()
+            raise
+        self.connection.commit()
+
+    def refresh(self):
+        data_version = self.read_data_version()
+        if data_version == self.data_version:
+            return set()
+
+        self.data_version = data_version
+        return {"patients", "appointments"}
+
+    def take_conflicts(self):
+        return []
+
+    def flush(self):
+        self.connection.commit()
+        # Committed transactions are in the write-ahead log (or already checkpointed into the synced database).
+        wal_filename = self.filename + "-wal"
+        if os.path.exists(wal_filename):
+            descriptor = os.open(wal_filename, os.O_RDWR)
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    def close(self):
+        self.connection.close()
+
+    def get_patient(self, number):
+        row = self.connection.execute("SELECT number, firstname, lastname FROM patients WHERE number = ?",
+                                      (number,)).fetchone()
+        if row is None:
+            return None
+        return model_entities.Patient(*row)
+
+    def get_all_patients(self):
+        rows = self.connection.execute("SELECT number, firstname, lastname FROM patients ORDER BY id")
+        return [model_entities.Patient(*row) for row in rows]
+
+    def get_patients_after(self, number, count):
+        if number is None:
+            rows = self.connection.execute("SELECT number, firstname, lastname FROM patients ORDER BY number LIMIT ?",
+                                           (count,))
+        else:
+            rows = self.connection.execute("SELECT number, firstname, lastname FROM patients WHERE number > ? "
+                                           "ORDER BY number LIMIT ?", (number, count))
+        return [model_entities.Patient(*row) for row in rows]
+
+    def get_patients_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM patients").fetchone()[0]
+
+    def add_patient(self, patient):
+        self.connection.execute("INSERT INTO patients (number, firstname, lastname) VALUES (?, ?, ?)",
+                                (patient.number, patient.firstname, patient.lastname))
+
+    def delete_patient(self, number):
+        self.connection.execute("UPDATE appointments SET patient_number = 'patient_deleted' WHERE patient_number = ?",
+                                (number,))
+        self.connection.execute("DELETE FROM patients WHERE number = ?", (number,))
+
+    def get_appointment(self, date, time):
+        row = self.connection.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE date = ? AND time = ?",
+                                      (date.isoformat(), time.isoformat())).fetchone()
+        if row is None:
+            return None
+        return row_to_appointment(row)
+
+    def get_overlapping_appointment(self, date, start, end):
+        row = self.connection.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE date = ? AND time < ? "
+                                      f"ORDER BY time DESC LIMIT 1",
+                                      (date.isoformat(), seconds_to_text(end))).fetchone()
+        if row is None:
+            return None
+        appointment = row_to_appointment(row)
+        if json_storage.appointment_seconds(appointment) + appointment.duration * 60 > start:
+            return appointment
+        return None
+
+    def get_appointments_by_date(self, date):
+        rows = self.connection.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE date = ? ORDER BY time",
+                                       (date.isoformat(),))
+        return [row_to_appointment(row) for row in rows]
+
+    def get_appointments_between(self, start, end):
+        rows = self.connection.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments "
+                                       f"WHERE (date, time) >= (?, ?) AND (date, time) < (?, ?) ORDER BY date, time",
+                                       (start.date().isoformat(), start.time().isoformat(),
+                                        end.date().isoformat(), end.time().isoformat()))
+        for row in rows:
+            yield row_to_appointment(row)
+
+    def get_appointments_by_patient(self, number):
+        rows = self.connection.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments WHERE patient_number = ? "
+                                       f"ORDER BY id", (number,))
+        return [row_to_appointment(row) for row in rows]
+
+    def get_all_appointments(self):
+        rows = self.connection.execute(f"SELECT {APPOINTMENT_COLUMNS} FROM appointments ORDER BY id")
+        return [row_to_appointment(row) for row in rows]
+
+    def get_appointments_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM appointments").fetchone()[0]
+
+    def add_appointment(self, appointment):
+        self.connection.execute(f"INSERT INTO appointments ({APPOINTMENT_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+                                (appointment.patient_number, appointment.date.isoformat(),
+                                 appointment.time.isoformat(), appointment.description, appointment.duration))
+
+    def delete_appointment(self, appointment):
+        self.connection.execute("DELETE FROM appointments WHERE id = (SELECT id FROM appointments "
+                                "WHERE date = ? AND time = ? AND patient_number = ? LIMIT 1)",
+                                (appointment.date.isoformat(), appointment.time.isoformat(),
+                                 appointment.patient_number))
+
+    def delete_appointments_before(self, date):
+        self.connection.execute("DELETE FROM appointments WHERE date < ?", (date.isoformat(),))
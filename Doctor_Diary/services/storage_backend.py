@@ -0,0 +1,245 @@
+class StorageBackend:
+    """
+    A base class for storages of patients and appointments used by ModelManager.
+    Storage does not check business rules (registered patient, free time slot),
+    it only finds, adds and deletes records.
+
+    Every changing method is called with the ModelManager group commit lock held,
+    so changes are never flushed in the middle of the operation.
+    Data can be shared by several processes (apps on other terminals), changing operations
+    and flushes also hold the data lock (see locked) and load changes of other processes first.
+    """
+
+    def get_patient(self, number):
+        """
+        Get patient by number.
+
+        Arguments:
+            number (str): patient number
+
+        Returns:
+            patient (Patient | None): patient for specified number or None if it is not registered
+        """
+
+        raise NotImplementedError
+
+    def get_all_patients(self):
+        """
+        Get all registered patients in registration order.
+
+        Returns:
+            patients (Patient[]): list of all registered patients
+        """
+
+        raise NotImplementedError
+
+    def get_patients_after(self, number, count):
+        """
+        Get patients sorted by number, starting after specified number.
+
+        Arguments:
+            number (str | None): number of the last patient of the previous page, None for the first page
+            count (int): maximal number of returned patients
+
+        Returns:
+            patients (Patient[]): list of at most count patients with greater numbers
+        """
+
+        raise NotImplementedError
+
+    def get_patients_count(self):
+        """
+        Get number of all registered patients.
+
+        Returns:
+            patients_count (int): number of all registered patients
+        """
+
+        raise NotImplementedError
+
+    def add_patient(self, patient):
+        """
+        Store new patient.
+
+        Arguments:
+            patient (Patient): new patient with unique number
+        """
+
+        raise NotImplementedError
+
+    def delete_patient(self, number):
+        """
+        Delete registered patient and set number in his appointments as 'patient_deleted'.
+
+        Arguments:
+            number (str): number of the registered patient
+        """
+
+        raise NotImplementedError
+
+    def get_appointment(self, date, time):
+        """
+        Get appointment booked in specified date, time.
+
+        Arguments:
+            date (date): appointment date
+            time (time): appointment time
+
+        Returns:
+            appointment (Appointment | None): appointment booked in specified date, time or None
+        """
+
+        raise NotImplementedError
+
+    def get_overlapping_appointment(self, date, start, end):
+        """
+        Get appointment of the day which overlaps specified period. Booked appointments never overlap
+        each other, so they end in the same order as they start and the last appointment starting
+        before the end of the period is the only one which has to be checked.
+
+        Arguments:
+            date (date): appointment date
+            start (int): beginning of the period in seconds since midnight (inclusive)
+            end (int): end of the period in seconds since midnight (exclusive)
+
+        Returns:
+            appointment (Appointment | None): appointment occupying part of the period or None if it is free
+        """
+
+        raise NotImplementedError
+
+    def get_appointments_by_date(self, date):
+        """
+        Get appointments for specified date.
+
+        Arguments:
+            date (date): appointment date
+
+        Returns:
+            day_appointments (Appointment[]): list of appointments for specified date sorted by time
+        """
+
+        raise NotImplementedError
+
+    def get_appointments_between(self, start, end):
+        """
+        Get appointments booked from start (inclusive) to end (exclusive).
+
+        Arguments:
+            start (datetime): beginning of the period
+            end (datetime): end of the period
+
+        Returns:
+            appointments (generator of Appointment): appointments sorted by date and time
+        """
+
+        raise NotImplementedError
+
+    def get_appointments_by_patient(self, number):
+        """
+        Get appointments for specified patient number.
+
+        Arguments:
+            number (str): patient number
+
+        Returns:
+            patient_appointments (Appointment[]): list of appointments for specified patient in booking order
+        """
+
+        raise NotImplementedError
+
+    def get_all_appointments(self):
+        """
+        Get all booked appointments in booking order.
+
+        Returns:
+            appointments (Appointment[]): list of all booked appointments
+        """
+
+        raise NotImplementedError
+
+    def get_appointments_count(self):
+        """
+        Get number of all booked appointments.
+
+        Returns:
+            appointments_count (int): number of all booked appointments
+        """
+
+        raise NotImplementedError
+
+    def add_appointment(self, appointment):
+        """
+        Store new appointment.
+
+        Arguments:
+            appointment (Appointment): new appointment in a free time slot
+        """
+
+        raise NotImplementedError
+
+    def delete_appointment(self, appointment):
+        """
+        Delete booked appointment.
+
+        Arguments:
+            appointment (Appointment): appointment returned by one of get methods
+        """
+
+        raise NotImplementedError
+
+    def delete_appointments_before(self, date):
+        """
+        Delete all appointments booked before specified date (moved into the archive).
+
+        Arguments:
+            date (date): first day of appointments which are kept
+        """
+
+        raise NotImplementedError
+
+    def locked(self):
+        """
+        Get context manager holding the lock of data shared with other processes, so they cannot change
+        the data meanwhile. The lock is re-entrant.
+
+        Returns:
+            lock (context manager): lock of the shared data
+        """
+
+        raise NotImplementedError
+
+    def refresh(self):
+        """
+        Load changes made by other processes since the last refresh. Changes of this process which
+        are not flushed yet are kept, the ones conflicting with other changes are dropped (see take_conflicts).
+
+        Returns:
+            changed (set[str]): 'patients' and/or 'appointments', parts of the data changed by other processes
+        """
+
+        raise NotImplementedError
+
+    def take_conflicts(self):
+        """
+        Get changes dropped since the last call, because they conflict with changes made by other processes
+        (e.g. the same time slot booked for another patient).
+
+        Returns:
+            conflicts (list[dict]): records with operation name and its arguments
+        """
+
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Write changes made since the last flush to disk. Called with the group commit lock
+        and the data lock held, after refresh, so changes of other processes are not overwritten.
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        """ Release storage resources. Called after the last flush, before the app exits. """
+
+        raise NotImplementedError
@@ -1,6 +1,8 @@
 import datetime
 from enum import Enum
 
+import services.model_entities as model_entities
+
 
 class Choice(Enum):
     """
@@ -16,6 +18,9 @@ class Choice(Enum):
         - DELETE_PATIENT: delete a registered patient
         - CANCEL_APPOINTMENT: cancel a booked appointment
         - PRINT_ALL_APPOINTMENTS: print all booked appointments in the app
+        - PRINT_PERIOD_APPOINTMENTS: print appointments between two dates (e.g. weekly, monthly view)
+        - FIND_FREE_SLOTS: print first free time slots from the specified date
+        - SEARCH_PATIENTS: print patients found by (a part of) first name or last name
     """
 
     EXIT = 0
@@ -27,6 +32,9 @@ class Choice(Enum):
     DELETE_PATIENT = 6
     CANCEL_APPOINTMENT = 7
     PRINT_ALL_APPOINTMENTS = 8
+    PRINT_PERIOD_APPOINTMENTS = 9
+    FIND_FREE_SLOTS = 10
+    SEARCH_PATIENTS = 11
 
 
 class UserInterface:
@@ -40,6 +48,8 @@ class UserInterface:
             welcome text printed on the console
         menu_choices: str
             menu text printed on the console
+        page_size: int
+            number of patients or appointments printed on one page of long listings
     """
 
     def __init__(self):
@@ -59,9 +69,13 @@ class UserInterface:
         | 6 |   DELETE A PATIENT                       |
         | 7 |   CANCEL AN APPOINTMENT                  |
         | 8 |   DISPLAY ALL APPOINTMENTS               |
+        | 9 |   DISPLAY APPOINTMENTS BETWEEN DATES     |
+        | 10 |  FIND FREE TIME SLOTS                   |
+        | 11 |  SEARCH PATIENTS BY NAME                |
         |---------------------------------------------|
         | 0 |   EXIT                                   |
         |=============================================|"""
+        self.page_size = 20
 
     def print_welcome(self):
         """Print welcome text on the console."""
@@ -104,15 +118,29 @@ class UserInterface:
         lastname = input("PATIENT'S LAST NAME: ")
         return firstname, lastname
 
-    def get_date(self):
+    def get_search_text(self):
+        """
+        Display the interface to get searched patient names.
+
+        Returns:
+            text (str): first name, last name or both (or their beginnings)
+        """
+
+        text = input("\nSEARCHED NAME: ")
+        return text
+
+    def get_date(self, title="ENTER APPOINTMENT DATE"):
         """
         Display the interface to get the appointment date from the user.
 
+        Arguments:
+            title (str): text printed above the date inputs
+
         Returns:
             date (date): [YYYY-MM-DD] formatted date of the appointment
         """
 
-        print("\nENTER APPOINTMENT DATE")
+        print(f"\n{title}")
         year = int(input("YEAR [YYYY]: "))
         month = int(input("MONTH [MM]: "))
         day = int(input("DAY [DD]: "))
@@ -133,6 +161,31 @@ class UserInterface:
         time = datetime.time(hour, minute, 0)
         return time
 
+    def get_appointment_duration(self):
+        """
+        Display the interface to get the appointment length, empty input means the default length.
+
+        Returns:
+            duration (int): appointment length in minutes
+        """
+
+        duration = input(f"DURATION [MINUTES, DEFAULT {model_entities.DEFAULT_DURATION}]: ")
+        if not duration.strip():
+            return model_entities.DEFAULT_DURATION
+        return int(duration)
+
+    def get_free_slots_query(self):
+        """
+        Display the interface to get the number and the length of searched free slots.
+
+        Returns:
+            query (int, int): number of slots and slot length in minutes in a tuple
+        """
+
+        count = int(input("\nNUMBER OF SLOTS: "))
+        slot_length = int(input("SLOT LENGTH [MINUTES]: "))
+        return count, slot_length
+
     def get_appointment_description(self):
         """
         Display the interface to get the appointment description.
@@ -165,16 +218,59 @@ class UserInterface:
         Print a list of appointments received in the function argument.
 
         Arguments:
-            appointments (Appointment[]): list of appointments printed for the user
+            appointments (iterable of Appointment): list or generator of appointments printed for the user
         """
 
-        if len(appointments) == 0:
+        printed = False
+        for appointment in appointments:
+            if not printed:
+                print("\nSCHEDULED APPOINTMENTS: ")
+                printed = True
+            print(appointment)
+
+        if not printed:
             self.print_info("NO SCHEDULED APPOINTMENTS")
+
+    def print_free_slots(self, slots):
+        """
+        Print a list of free slots received in the function argument.
+
+        Arguments:
+            slots (datetime[]): starts of free slots
+        """
+
+        if len(slots) == 0:
+            self.print_info("NO FREE TIME SLOTS")
             return
 
-        print("\nSCHEDULED APPOINTMENTS: ")
-        for appointment in appointments:
-            print(appointment)
+        print("\nFREE TIME SLOTS: ")
+        for slot in slots:
+            print(f"[{slot.date()}\t{slot.strftime('%H:%M')}]")
+
+    def print_import_error(self, line_number, error):
+        """
+        Print a record rejected by the import.
+
+        Arguments:
+            line_number (int): line of the rejected record in the imported file
+            error (str): reason of the rejection
+        """
+
+        print(f"LINE {line_number}: {error}")
+
+    def next_page(self, stop_text="BACK TO MENU"):
+        """
+        Ask the user whether the next page of a listing should be printed.
+
+        Arguments:
+            stop_text (str): what happens when the user stops the listing
+
+        Returns:
+            next_page (bool): True if the user wants to see the next page
+        """
+
+        answer = input(f"\n[ENTER] NEXT PAGE, [Q] {stop_text}: ")
+        return answer.strip().upper() != "Q"
 
     def print_info(self, info: str):
         """Print extra information for the user."""